@@ -0,0 +1,53 @@
+"""
+Fixed-point amounts for the exact (integer) mode.
+
+Quantities are integer rao, prices integer micro-USD per TAO, and USD values
+are rao * micro-USD. Everything stays an integer until it is written out.
+"""
+from decimal import Decimal, ROUND_HALF_EVEN, localcontext
+
+RAO_PER_TAO = 1_000_000_000
+PRICE_SCALE = 1_000_000  # prices are stored in micro-USD per TAO
+VALUE_SCALE = RAO_PER_TAO * PRICE_SCALE  # rao * micro-USD per USD
+
+# Wide enough for any rao * micro-USD product we can meet
+_PRECISION = 60
+
+
+def price_to_fixed(price):
+    """USD price (float, str or Decimal) -> integer micro-USD, rounded half-even."""
+    if isinstance(price, float):
+        price = repr(price)  # shortest repr round-trips the exchange's decimal string
+    with localcontext() as ctx:
+        ctx.prec = _PRECISION
+        return int((Decimal(price) * PRICE_SCALE).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def format_fixed(value, scale, places):
+    """Render the integer 'value' / 'scale' as a decimal string with 'places' decimals."""
+    with localcontext() as ctx:
+        ctx.prec = _PRECISION
+        return format((Decimal(value) / scale).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_EVEN), "f")
+
+
+def format_tao(rao):
+    """Rao -> exact TAO string (9 decimals)."""
+    return format_fixed(rao, RAO_PER_TAO, 9)
+
+
+def format_price(micro_usd):
+    """Micro-USD -> USD price string (6 decimals)."""
+    return format_fixed(micro_usd, PRICE_SCALE, 6)
+
+
+def format_usd(value):
+    """Rao * micro-USD -> USD string rounded to cents."""
+    return format_fixed(value, VALUE_SCALE, 2)
+
+
+def format_percentage(numerator, denominator, places=2):
+    """100 * numerator / denominator as a decimal string."""
+    with localcontext() as ctx:
+        ctx.prec = _PRECISION
+        ratio = Decimal(numerator) * 100 / Decimal(denominator)
+        return format(ratio.quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_EVEN), "f")
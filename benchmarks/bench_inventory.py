@@ -0,0 +1,168 @@
+"""
+Benchmark: lots.LotStack-backed read_lifo.Inventory vs. the previous deque-of-dicts Inventory.
+
+Simulates years of daily mining emissions (one new lot per day per wallet) with
+periodic sells, some of them large enough to walk thousands of lots. With --journal,
+also compares an exact-mode Inventory on a memory-mapped lot journal (lot_journal.py)
+against one on an exact LotStack.
+
+    python -m benchmarks.bench_inventory --lots 200000 --journal /tmp/lots.jrnl
+"""
+import argparse
+import logging
+import random
+import time
+from collections import deque
+
+from amounts import RAO_PER_TAO, price_to_fixed
+from lot_journal import LotJournal
+from read_lifo import Inventory
+
+logger = logging.getLogger("read_lifo")
+
+
+class DequeInventory:
+    """
+    The previous Inventory implementation (one dict per lot, linear pop loop), kept for
+    comparison. Its debug logging is guarded the way read_lifo.Inventory's is, so both
+    sides pay the same logging cost and only the lot handling is compared.
+    """
+
+    def __init__(self):
+        self.inventory = deque()
+        self.current_inventory = 0
+
+    def add_inventory(self, quantity, price):
+        self.inventory.append({"quantity": quantity, "price": price})
+        self.current_inventory += quantity
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[add_inventory] Added => QTY: %s, Price: %s, New current: %s", quantity, price, self.current_inventory
+            )
+
+    def sell_inventory(self, quantity_to_sell, sell_price):
+        cogs = 0
+        remaining_quantity = quantity_to_sell
+        loss = 0
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("[sell_inventory] Starting LIFO sale => Sell: %s, Price: %s", quantity_to_sell, sell_price)
+
+        while remaining_quantity > 0 and self.inventory:
+            recent_batch = self.inventory.pop()
+            batch_quantity = recent_batch["quantity"]
+            batch_price = recent_batch["price"]
+
+            if batch_quantity <= remaining_quantity:
+                cogs += batch_quantity * batch_price
+                remaining_quantity -= batch_quantity
+                self.current_inventory -= batch_quantity
+                if debug:
+                    logger.debug(
+                        "[sell_inventory] Selling entire batch => BatchQty: %s, BatchPrice: %s, "
+                        "RemainingQtyToSell: %s, Updated current_inventory: %s",
+                        batch_quantity, batch_price, remaining_quantity, self.current_inventory,
+                    )
+            else:
+                cogs += remaining_quantity * batch_price
+                recent_batch["quantity"] -= remaining_quantity
+                self.inventory.append(recent_batch)
+                self.current_inventory -= remaining_quantity
+                if debug:
+                    logger.debug(
+                        "[sell_inventory] Selling partial batch => SellQty: %s, RemainingBatchQty: %s, "
+                        "Updated current_inventory: %s",
+                        remaining_quantity, recent_batch["quantity"], self.current_inventory,
+                    )
+                remaining_quantity = 0
+
+        total_revenue_from_sale = quantity_to_sell * sell_price
+        if total_revenue_from_sale < cogs:
+            loss = cogs - total_revenue_from_sale
+
+        return cogs, loss
+
+
+def make_operations(n_lots, sell_every, big_sell_every, seed):
+    """Build a reproducible list of ('add'|'sell', quantity, price) operations."""
+    rng = random.Random(seed)
+    ops = []
+    price = 300.0
+    held = 0.0
+    for day in range(1, n_lots + 1):
+        price = max(1.0, price * (1 + rng.uniform(-0.05, 0.05)))
+        quantity = rng.uniform(0.5, 3.0)
+        ops.append(("add", quantity, price))
+        held += quantity
+        if day % big_sell_every == 0:
+            # Big sell: half of everything held, walks thousands of lots
+            quantity = held * 0.5
+            ops.append(("sell", quantity, price))
+            held -= quantity
+        elif day % sell_every == 0:
+            quantity = held * rng.uniform(0.001, 0.02)
+            ops.append(("sell", quantity, price))
+            held -= quantity
+    return ops
+
+
+def run(inventory_cls, ops):
+    """Replay 'ops'; returns (total_seconds, sell_seconds, total_cogs, inventory_left)."""
+    inventory = inventory_cls()
+    total_cogs = 0.0
+    sell_time = 0.0
+    clock = time.perf_counter
+    start = clock()
+    for op, quantity, price in ops:
+        if op == "add":
+            inventory.add_inventory(quantity, price)
+        else:
+            t0 = clock()
+            cogs, _ = inventory.sell_inventory(quantity, price)
+            sell_time += clock() - t0
+            total_cogs += cogs
+    elapsed = clock() - start
+    return elapsed, sell_time, total_cogs, inventory.current_inventory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lots", type=int, default=200_000, help="number of daily lots to add")
+    parser.add_argument("--sell-every", type=int, default=7, help="small sell every N lots")
+    parser.add_argument("--big-sell-every", type=int, default=5_000, help="sell half the inventory every N lots")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="INFO", help="level of the read_lifo logger during the run")
+    parser.add_argument("--journal", help="also time an exact-mode Inventory on a lot journal at this path")
+    args = parser.parse_args()
+
+    logger.setLevel(args.log_level.upper())
+    ops = make_operations(args.lots, args.sell_every, args.big_sell_every, args.seed)
+    sells = sum(1 for op in ops if op[0] == "sell")
+
+    old_time, old_sell, old_cogs, old_left = run(DequeInventory, ops)
+    new_time, new_sell, new_cogs, new_left = run(Inventory, ops)
+
+    print(f"operations: {len(ops)} ({args.lots} lots, {sells} sells)")
+    print(f"deque Inventory:    total {old_time:8.3f}s  sells {old_sell:8.3f}s  COGS={old_cogs:.6f}  left={old_left:.6f}")
+    print(f"LotStack Inventory: total {new_time:8.3f}s  sells {new_sell:8.3f}s  COGS={new_cogs:.6f}  left={new_left:.6f}")
+    print(f"speedup: total {old_time / new_time:.1f}x, sells {old_sell / new_sell:.1f}x")
+
+    # Both must agree up to float rounding of the running sums
+    assert abs(old_cogs - new_cogs) <= 1e-9 * max(1.0, abs(old_cogs)), "COGS mismatch"
+    assert abs(old_left - new_left) <= 1e-9 * max(1.0, abs(old_left)), "inventory mismatch"
+
+    if args.journal:
+        exact_ops = [(op, round(quantity * RAO_PER_TAO), price_to_fixed(price)) for op, quantity, price in ops]
+        stack_time, stack_sell, stack_cogs, stack_left = run(lambda: Inventory(exact=True), exact_ops)
+        with LotJournal(args.journal, reset=True) as journal:
+            journal_time, journal_sell, journal_cogs, journal_left = run(
+                lambda: Inventory(exact=True, journal=journal), exact_ops
+            )
+        print(f"exact LotStack:     total {stack_time:8.3f}s  sells {stack_sell:8.3f}s")
+        print(f"LotJournal:         total {journal_time:8.3f}s  sells {journal_sell:8.3f}s")
+        assert (stack_cogs, stack_left) == (journal_cogs, journal_left), "journal mismatch"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark: the whole pipeline against a local stand-in for the taostats and MEXC APIs.
+
+Generates a synthetic history (wallets x days x transfers per day, see fake_api.py),
+then times each stage: fetching into the store, block timestamp resolution, prices,
+daily aggregation, writing data_total_final2, the LIFO replay (with the time spent in
+Inventory.sell_inventory broken out) and writing the daily report. The HTTP statistics
+and counters from metrics.py are included. Results are printed
+as JSON; with --baseline, stages more than --max-slowdown times slower than in an
+earlier result make the run exit with status 1.
+
+    python -m benchmarks.bench_pipeline --wallets 20 --days 730 --transfers-per-day 6 --output bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import metrics
+import prices
+import read_all_new
+from benchmarks.fake_api import SELL_WALLET, START, FakeApiServer
+from read_lifo import Inventory, LedgerFormat, process_rows, write_report
+from store import HistoryStore
+from tables import read_table
+
+logger = logging.getLogger(__name__)
+
+
+def timed(stages, name, fn, *args, **kwargs):
+    """Run fn, record its wall and CPU time under stages[name] and return its result."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args, **kwargs)
+    stages[name] = {
+        "wall_s": round(time.perf_counter() - wall, 6),
+        "cpu_s": round(time.process_time() - cpu, 6),
+    }
+    logger.info(f"{name}: {stages[name]['wall_s']:.3f}s")
+    return result
+
+
+def _configure(server, workdir, args):
+    read_all_new.TAOSTATS_BASE_URL = server.base_url
+    read_all_new.REQUESTS_PER_MINUTE = args.requests_per_minute
+    read_all_new.REQUESTS_BURST = args.fetch_workers
+    read_all_new.FETCH_WORKERS = args.fetch_workers
+    read_all_new._FETCHER = None
+    read_all_new.STORE_PATH = os.path.join(workdir, "bench.sqlite3")
+    read_all_new.AGGREGATION_ENGINE = args.engine
+    read_all_new.EXACT_MODE = args.exact
+    read_all_new.PRICE_SOURCES = ["mexc"]
+    read_all_new.PRICE_HISTORY_START = START
+    read_all_new._WALLETS = list(server.wallets)
+    read_all_new._SELL_WALLETS = [SELL_WALLET]
+    read_all_new._SECONDARY_WALLETS = []
+    prices.KLINE_SOURCES["mexc"]["url"] = f"{server.base_url}/api/v3/klines"
+
+
+def run(args, workdir):
+    """Run every stage once; returns the result document."""
+    stages = {}
+    counts = {}
+    metrics.reset()
+    table_path = os.path.join(workdir, "data_total_final2.csv")
+    report_path = os.path.join(workdir, "daily_report.csv")
+
+    with FakeApiServer(args.wallets, args.days, args.transfers_per_day, args.seed) as server:
+        _configure(server, workdir, args)
+        wallets = read_all_new._WALLETS
+        store = HistoryStore(read_all_new.STORE_PATH)
+        try:
+            counts["pages"] = timed(stages, "fetch", read_all_new.sync_wallets, store, wallets)
+            counts["transfers"] = store.conn.execute("SELECT COUNT(*) FROM transfers").fetchone()[0]
+
+            blocks = [b for (b,) in store.conn.execute(
+                "SELECT block_number FROM transfers ORDER BY block_number LIMIT ?", (args.blocks,)
+            )]
+            counts["blocks"] = len(blocks)
+            timed(stages, "block_timestamps", read_all_new.get_block_timestamps, blocks, store=store)
+
+            price_map = timed(stages, "prices", read_all_new.get_price_map, store)
+            combined = timed(stages, "aggregation", lambda: list(read_all_new.iter_combined_days(
+                read_all_new.aggregate_wallets(store, wallets, workers=args.workers)
+            )))
+            counts["days"] = len(combined)
+            timed(stages, "write_table", read_all_new.write_combined_table, table_path, combined, price_map)
+        finally:
+            store.close()
+            read_all_new._FETCHER.close()
+
+    fieldnames, rows = read_table(table_path)
+    fmt = LedgerFormat.detect(fieldnames)
+    rows = list(rows)
+    inventory = Inventory(exact=fmt.exact)
+
+    # Time sell_inventory on its own as well
+    sell = inventory.sell_inventory
+    sell_stats = {"calls": 0, "wall_s": 0.0}
+
+    def timed_sell(quantity, price):
+        start = time.perf_counter()
+        try:
+            return sell(quantity, price)
+        finally:
+            sell_stats["calls"] += 1
+            sell_stats["wall_s"] += time.perf_counter() - start
+
+    inventory.sell_inventory = timed_sell
+    days = timed(stages, "lifo_replay", lambda: list(process_rows(rows, inventory, fmt)))
+    stages["sell_inventory"] = {"wall_s": round(sell_stats["wall_s"], 6), "calls": sell_stats["calls"]}
+    counts["lots_left"] = len(inventory.inventory)
+    timed(stages, "report_write", write_report, report_path, days, fmt)
+    recorded = metrics.snapshot()
+
+    return {
+        "benchmark": "pipeline",
+        "params": {
+            "wallets": args.wallets, "days": args.days, "transfers_per_day": args.transfers_per_day,
+            "seed": args.seed, "engine": args.engine, "exact": args.exact, "workers": args.workers,
+            "fetch_workers": args.fetch_workers,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "stages": stages,
+        "counts": counts,
+        "counters": recorded["counters"],
+        "http": recorded["http"],
+    }
+
+
+def regressions(result, baseline, max_slowdown):
+    """Stages whose wall time grew by more than 'max_slowdown' times against 'baseline'."""
+    slower = []
+    for name, stage in result["stages"].items():
+        before = baseline.get("stages", {}).get(name, {}).get("wall_s")
+        # Sub-millisecond stages are too noisy to compare
+        if before and before >= 0.001 and stage["wall_s"] > before * max_slowdown:
+            slower.append(f"{name}: {before:.3f}s -> {stage['wall_s']:.3f}s")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wallets", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--transfers-per-day", type=int, default=4, help="per wallet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python", help="aggregation engine")
+    parser.add_argument("--exact", action="store_true", help="run in exact integer mode")
+    parser.add_argument("--workers", type=int, default=1, help="aggregation worker processes")
+    parser.add_argument("--fetch-workers", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=float, default=1_000_000, help="fetch rate limit")
+    parser.add_argument("--blocks", type=int, default=2000, help="block numbers to resolve to timestamps")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--baseline", help="earlier JSON result to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25, help="allowed slowdown against --baseline")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
+    workdir = tempfile.mkdtemp(prefix="bittensor-lifo-bench-")
+    try:
+        result = run(args, workdir)
+    finally:
+        if args.keep:
+            print(f"working directory: {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(result, json.load(f), args.max_slowdown)
+        for line in slower:
+            print(f"regression: {line}", file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Synthetic wallet histories served by a local stand-in for the taostats and MEXC APIs.
+
+make_history() builds balance snapshots and transfers for W wallets over D days with
+T transfers per wallet per day, in the shapes taostats returns them (newest first,
+paged by 'page'/'limit'). FakeApiServer serves that history, block timestamps and
+MEXC-style klines over HTTP from a separate process, so the server's JSON encoding
+does not compete with the code being measured.
+
+    with FakeApiServer(wallets=10, days=365, transfers_per_day=4) as server:
+        read_all_new.TAOSTATS_BASE_URL = server.base_url
+"""
+import json
+import multiprocessing
+import random
+from datetime import datetime, timedelta, UTC
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+START = datetime(2024, 1, 1, tzinfo=UTC)
+GENESIS_BLOCK = 2_000_000
+BLOCK_SECONDS = 12
+SELL_WALLET = "5SELLxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+# Counterparty of every transfer that is neither a sell nor between our wallets
+EXTERNAL_WALLET = "5EXTERNALxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx"
+RAO = 10 ** 9
+DAY_MS = 24 * 60 * 60 * 1000
+INTERVAL_MS = {"60m": DAY_MS // 24, "1h": DAY_MS // 24, "4h": DAY_MS // 6, "1d": DAY_MS}
+
+
+def wallet_address(i):
+    return f"5W{i:06d}" + "x" * 40
+
+
+def block_at(moment):
+    return GENESIS_BLOCK + int((moment - START).total_seconds()) // BLOCK_SECONDS
+
+
+def block_time(block):
+    return START + timedelta(seconds=(block - GENESIS_BLOCK) * BLOCK_SECONDS)
+
+
+def _ts(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def make_history(wallets, days, transfers_per_day, seed=42):
+    """
+    Return {address: {"balances": [...], "outbound": [...], "inbound": [...]}}, newest first.
+    About a third of the transfers are inbound from EXTERNAL_WALLET, and every other
+    outbound one goes to SELL_WALLET (the rest to EXTERNAL_WALLET). No transfer is between
+    two generated wallets, so every wallet's history is complete on its own.
+    """
+    rng = random.Random(seed)
+    history = {}
+    for w in range(wallets):
+        address = wallet_address(w)
+        balances, outbound, inbound = [], [], []
+        total = rng.randint(100, 1000) * RAO
+        for day in range(days):
+            midnight = START + timedelta(days=day)
+            for k in range(transfers_per_day):
+                moment = midnight + timedelta(seconds=rng.randint(0, 86_000))
+                amount = rng.randint(1, 5 * RAO)
+                block = block_at(moment)
+                row = {
+                    "id": f"{block}-{w}-{k}",
+                    "block_number": block,
+                    "timestamp": _ts(moment),
+                    "amount": str(amount),
+                    "fee": str(125_000),
+                    "extrinsic_id": f"{block}-{k:04d}",
+                    "transaction_hash": f"0x{rng.getrandbits(128):032x}",
+                }
+                if k % 3 == 2:
+                    row["from"], row["to"] = {"ss58": EXTERNAL_WALLET}, {"ss58": address}
+                    inbound.append(row)
+                    total += amount
+                else:
+                    destination = SELL_WALLET if k % 2 else EXTERNAL_WALLET
+                    row["from"], row["to"] = {"ss58": address}, {"ss58": destination}
+                    outbound.append(row)
+                    total = max(0, total - amount)
+            # Daily emission, then the end-of-day snapshot
+            total += rng.randint(RAO // 2, 3 * RAO)
+            moment = midnight + timedelta(hours=23, minutes=59)
+            balances.append({
+                "address": {"ss58": address},
+                "block_number": block_at(moment),
+                "timestamp": _ts(moment),
+                "balance_free": str(total // 4),
+                "balance_staked": str(total - total // 4),
+                "balance_total": str(total),
+            })
+        history[address] = {
+            "balances": sorted(balances, key=lambda r: r["block_number"], reverse=True),
+            "outbound": sorted(outbound, key=lambda r: r["block_number"], reverse=True),
+            "inbound": sorted(inbound, key=lambda r: r["block_number"], reverse=True),
+        }
+    return history
+
+
+def make_klines(days, seed=42):
+    """Daily [open_time, open, high, low, close, volume, ...] candles starting at START."""
+    rng = random.Random(seed)
+    price = 300.0
+    candles = []
+    for day in range(days + 1):
+        open_ = price
+        price = max(1.0, price * (1 + rng.uniform(-0.05, 0.05)))
+        open_time = int((START + timedelta(days=day)).timestamp() * 1000)
+        candles.append([
+            open_time, f"{open_:.4f}", f"{max(open_, price) * 1.01:.4f}", f"{min(open_, price) * 0.99:.4f}",
+            f"{price:.4f}", f"{rng.uniform(1e4, 1e5):.2f}", open_time + DAY_MS - 1, "0",
+        ])
+    return candles
+
+
+def _page(rows, query):
+    page = int(query.get("page", ["1"])[0])
+    limit = int(query.get("limit", ["200"])[0])
+    total_pages = max(1, -(-len(rows) // limit))
+    return {
+        "pagination": {
+            "current_page": page,
+            "per_page": limit,
+            "total_items": len(rows),
+            "total_pages": total_pages,
+            "next_page": page + 1 if page < total_pages else None,
+            "prev_page": page - 1 if page > 1 else None,
+        },
+        "data": rows[(page - 1) * limit:page * limit],
+    }
+
+
+def _make_handler(history, klines):
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real APIs
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/api/account/history/v1":
+                body = _page(history.get(query["address"][0], {}).get("balances", []), query)
+            elif url.path == "/api/transfer/v1":
+                stream = "outbound" if "from" in query else "inbound"
+                body = _page(history.get(query["address"][0], {}).get(stream, []), query)
+            elif url.path == "/api/block/v1":
+                start, end = int(query["block_start"][0]), int(query["block_end"][0])
+                rows = [
+                    {"block_number": b, "timestamp": _ts(block_time(b))}
+                    for b in range(end, start - 1, -1)
+                ]
+                body = _page(rows, query)
+            elif url.path == "/api/v3/klines":
+                start_ms, end_ms = int(query["startTime"][0]), int(query["endTime"][0])
+                limit = int(query.get("limit", ["500"])[0])
+                if INTERVAL_MS.get(query["interval"][0]) != DAY_MS:
+                    body = []
+                else:
+                    body = [c for c in klines if start_ms <= c[0] <= end_ms][:limit]
+            else:
+                self.send_error(404)
+                return
+
+            payload = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
+
+
+def _serve(params, ready):
+    history = make_history(params["wallets"], params["days"], params["transfers_per_day"], params["seed"])
+    klines = make_klines(params["days"], params["seed"])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(history, klines))
+    ready.send(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeApiServer:
+    """Run the stand-in API in a child process; base_url is set once it is listening."""
+
+    def __init__(self, wallets, days, transfers_per_day, seed=42):
+        self.params = {"wallets": wallets, "days": days, "transfers_per_day": transfers_per_day, "seed": seed}
+        self.wallets = [wallet_address(i) for i in range(wallets)]
+        self.base_url = None
+        self._process = None
+
+    def __enter__(self):
+        parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve, args=(self.params, child), daemon=True)
+        self._process.start()
+        self.base_url = f"http://127.0.0.1:{parent.recv()}"
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,170 @@
+"""
+bittensor-lifo: one command line for the whole pipeline.
+
+    bittensor-lifo fetch       sync wallet history and TAO prices into the local store
+    bittensor-lifo aggregate   write data_total_final2 from the store (no network; --sync to fetch first)
+    bittensor-lifo lifo        daily cost-basis report (the read_lifo options)
+    bittensor-lifo report      same, plus month/quarter/year rollups unless --period is given
+    bittensor-lifo events      cost basis per acquisition and sale from the store, priced hourly
+    bittensor-lifo bench       pipeline benchmark (the benchmarks.bench_pipeline options)
+
+Run 'bittensor-lifo COMMAND --help' for a command's options. Only the modules a command
+needs are imported, so e.g. 'aggregate' and 'lifo' never load requests. Settings
+(API key, wallets, store path, ...) come from --config / $BITTENSOR_LIFO_CONFIG and
+BITTENSOR_LIFO_* environment variables; see config.py.
+"""
+import argparse
+
+import metrics
+from config import apply_config, load_config
+from log_setup import add_logging_arguments, configure_logging
+
+
+def _parser(command, description):
+    return argparse.ArgumentParser(prog=f"bittensor-lifo {command}", description=description)
+
+
+def _parse(parser, argv):
+    """Add the shared logging/metrics options, parse 'argv' and set both up."""
+    add_logging_arguments(parser)
+    metrics.add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level, args.trace_every)
+    metrics.configure(args.profile_stage, args.profiler)
+    return args
+
+
+def _read_all_new(settings):
+    import read_all_new
+
+    apply_config(settings, read_all_new)
+    return read_all_new
+
+
+# ---------------------------
+# Commands
+# ---------------------------
+
+def fetch(argv, settings):
+    read_all_new = _read_all_new(settings)
+    from store import HistoryStore
+
+    parser = _parser("fetch", "Sync wallet history and TAO prices into the local store.")
+    parser.add_argument("--event-prices", action="store_true", help="also fetch the hourly prices 'events' uses")
+    args = _parse(parser, argv)
+    store = HistoryStore(read_all_new.STORE_PATH)
+    try:
+        read_all_new.fetch(store, event_prices=args.event_prices)
+    finally:
+        store.close()
+        metrics.export(args, "fetch")
+
+
+def aggregate(argv, settings):
+    read_all_new = _read_all_new(settings)
+    parser = _parser("aggregate", "Write data_total_final2 from the local store.")
+    read_all_new.add_arguments(parser)
+    parser.add_argument("--sync", action="store_true", help="fetch new history and prices first")
+    args = _parse(parser, argv)
+    read_all_new.run(args, sync=args.sync)
+
+
+def lifo(argv, settings, default_periods=()):
+    import read_lifo
+    from tables import with_format
+
+    command = "report" if default_periods else "lifo"
+    parser = _parser(command, read_lifo.main.__doc__.strip().splitlines()[0])
+    read_lifo.add_arguments(parser)
+    # Read whatever 'aggregate' wrote with the same settings
+    parser.set_defaults(input=with_format(
+        settings.get("output_file", "data_total_final2.csv"), settings.get("output_format", "csv")
+    ))
+    args = _parse(parser, argv)
+    if not args.period:
+        args.period = list(default_periods)
+    read_lifo.run(args, parser)
+
+
+def report(argv, settings):
+    from reports import PERIODS
+
+    lifo(argv, settings, default_periods=list(PERIODS))
+
+
+def events(argv, settings):
+    read_all_new = _read_all_new(settings)
+    import read_lifo
+    from lots import COST_BASIS_ENGINES
+    from reports import PERIODS
+    from store import HistoryStore
+    from tables import FORMATS, with_format
+
+    parser = _parser("events", "Cost basis per acquisition and sale, in time order across all wallets.")
+    parser.add_argument("--sync", action="store_true", help="fetch new history and hourly prices first")
+    parser.add_argument("--method", choices=sorted(COST_BASIS_ENGINES), default="lifo", help="cost-basis method")
+    parser.add_argument("--report-format", choices=sorted(FORMATS), default="csv", help="format of the reports")
+    parser.add_argument(
+        "--period", action="append", choices=list(PERIODS),
+        help="also write period rollups (report_events_<period>); repeat for several",
+    )
+    parser.add_argument("--from", dest="date_from", type=read_lifo._iso_date, help="first day to report")
+    parser.add_argument("--to", dest="date_to", type=read_lifo._iso_date, help="last day to report")
+    parser.add_argument("--lot-journal", help="keep the lots in this memory-mapped journal (exact mode, LIFO)")
+    args = _parse(parser, argv)
+    if args.lot_journal and args.method != "lifo":
+        parser.error("--lot-journal only supports --method lifo")
+    if args.date_from and args.date_to and args.date_from > args.date_to:
+        parser.error("--from is after --to")
+
+    store = HistoryStore(read_all_new.STORE_PATH)
+    try:
+        if args.sync:
+            read_all_new.fetch(store, event_prices=True)
+        with metrics.stage("prices"):
+            price_at = read_all_new.get_event_prices(store, fetch=False)
+        read_lifo.run_events(
+            read_all_new.iter_events(store, read_all_new._WALLETS), price_at,
+            with_format("daily_report_events.csv", args.report_format), exact=read_all_new.EXACT_MODE,
+            method=args.method, periods=list(dict.fromkeys(args.period or [])),
+            date_from=args.date_from, date_to=args.date_to,
+            report_format=args.report_format, lot_journal=args.lot_journal,
+        )
+    finally:
+        store.close()
+        metrics.export(args, "events")
+
+
+def bench(argv, settings):
+    from benchmarks import bench_pipeline
+
+    bench_pipeline.main(argv)
+
+
+COMMANDS = {
+    "fetch": fetch,
+    "aggregate": aggregate,
+    "lifo": lifo,
+    "report": report,
+    "events": events,
+    "bench": bench,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="bittensor-lifo", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--config", help="TOML or JSON settings file (default: $BITTENSOR_LIFO_CONFIG)")
+    parser.add_argument("command", choices=list(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="options of the command")
+    args = parser.parse_args(argv)
+    try:
+        settings = load_config(args.config)
+    except (OSError, ValueError) as e:
+        parser.error(f"could not load settings: {e}")
+    COMMANDS[args.command](args.args, settings)
+
+
+if __name__ == "__main__":
+    main()
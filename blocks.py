@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime, UTC
+
+logger = logging.getLogger(__name__)
+
+# Bittensor produces a block roughly every 12 seconds
+BLOCK_TIME_SECONDS = 12
+# One taostats page holds this many blocks
+RANGE_SIZE = 200
+# Spacing of the anchor blocks used for interpolation (600 blocks ~ 2 hours)
+ANCHOR_SPACING = 600
+
+
+def _to_seconds(ts):
+    return datetime.fromisoformat(ts).timestamp()
+
+
+def _to_timestamp(seconds):
+    return datetime.fromtimestamp(round(seconds), UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class BlockTimestampResolver:
+    """
+    Resolve many block numbers to timestamps with as few taostats requests as possible.
+
+    Block numbers are de-duplicated and looked up in the store's block_timestamps table
+    first. The rest are either fetched as contiguous block ranges (one page per up to
+    RANGE_SIZE blocks, every block on the page gets cached), or, with 'interpolate' set,
+    estimated from anchor blocks on a fixed ANCHOR_SPACING grid, so a whole day of
+    transfers costs a dozen requests at most. Interpolated timestamps are cached as such
+    and are fetched exactly if later asked for without interpolation.
+    """
+
+    def __init__(self, store, fetcher, base_url):
+        self.store = store
+        self.fetcher = fetcher
+        self.base_url = base_url
+
+    def _range_url(self, start, end):
+        return lambda page: (
+            f"{self.base_url}/api/block/v1?block_start={start}&block_end={end}&page={page}&limit={RANGE_SIZE}"
+        )
+
+    def _fetch_ranges(self, ranges):
+        """Fetch [start, end] block ranges in parallel and cache every block returned."""
+        if not ranges:
+            return
+        logger.debug(f"Fetching {len(ranges)} block range(s) from taostats...")
+        pages = self.fetcher.fetch_many({r: self._range_url(*r) for r in ranges})
+        rows = [
+            (int(row["block_number"]), row["timestamp"], 1)
+            for got in pages.values() for page in got for row in page
+        ]
+        self.store.save_block_timestamps(rows)
+        self.store.commit()
+
+    def resolve(self, blocks, interpolate=False):
+        """Return {block_number: timestamp} for every block that could be resolved."""
+        wanted = sorted({int(b) for b in blocks})
+        if not wanted:
+            return {}
+
+        cached = self.store.load_block_timestamps(wanted[0], wanted[-1], exact_only=not interpolate)
+        missing = [b for b in wanted if b not in cached]
+        logger.debug(f"Resolving {len(wanted)} block(s): {len(wanted) - len(missing)} cached, {len(missing)} missing.")
+
+        if missing and interpolate:
+            cached.update(self._interpolate(missing))
+        elif missing:
+            # Group nearby blocks so each range fits on one page
+            ranges = []
+            for b in missing:
+                if ranges and b - ranges[-1][0] < RANGE_SIZE:
+                    ranges[-1][1] = b
+                else:
+                    ranges.append([b, b])
+            self._fetch_ranges([tuple(r) for r in ranges])
+            cached.update(self.store.load_block_timestamps(missing[0], missing[-1], exact_only=True))
+
+        return {b: cached[b] for b in wanted if b in cached}
+
+    def _interpolate(self, missing):
+        """Estimate timestamps for 'missing' blocks from the surrounding grid anchors."""
+        grid = sorted({g for b in missing for g in (b // ANCHOR_SPACING * ANCHOR_SPACING,
+                                                     b // ANCHOR_SPACING * ANCHOR_SPACING + ANCHOR_SPACING)})
+        anchors = self.store.load_block_timestamps(grid[0], grid[-1], exact_only=True)
+        self._fetch_ranges([(g, g) for g in grid if g not in anchors])
+        anchors.update(self.store.load_block_timestamps(grid[0], grid[-1], exact_only=True))
+
+        estimated = {}
+        for b in missing:
+            if b in anchors:
+                estimated[b] = anchors[b]
+                continue
+            g0 = b // ANCHOR_SPACING * ANCHOR_SPACING
+            g1 = g0 + ANCHOR_SPACING
+            if g0 in anchors and g1 in anchors:
+                t0, t1 = _to_seconds(anchors[g0]), _to_seconds(anchors[g1])
+                seconds = t0 + (b - g0) * (t1 - t0) / (g1 - g0)
+            elif g0 in anchors:
+                # Near the chain head there is no upper anchor yet
+                seconds = _to_seconds(anchors[g0]) + (b - g0) * BLOCK_TIME_SECONDS
+            elif g1 in anchors:
+                seconds = _to_seconds(anchors[g1]) - (g1 - b) * BLOCK_TIME_SECONDS
+            else:
+                logger.warning(f"No anchor blocks around block {b}; cannot interpolate its timestamp.")
+                continue
+            estimated[b] = _to_timestamp(seconds)
+
+        self.store.save_block_timestamps(
+            [(b, ts, 0) for b, ts in estimated.items() if b not in anchors]
+        )
+        self.store.commit()
+        return estimated
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import struct
+from itertools import chain
+
+from lots import LotStack
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LIFOCKP2"
+# magic, exact, touched, last date (YYYY-MM-DD), rows processed, report size, input digest, lot count
+_HEADER = struct.Struct("<8s??10sQQ32sQ")
+_SUFFIX = ".ckpt"
+
+
+def new_digest():
+    return hashlib.blake2b(digest_size=32)
+
+
+def hashed_lines(lines, digest):
+    """Pass input lines through while feeding them to 'digest' (see fast_forward)."""
+    for line in lines:
+        digest.update(line.encode())
+        yield line
+
+
+class Checkpoint:
+    """
+    Inventory state after the first 'rows' input rows of a ledger.
+
+    'digest' covers the input lines those rows were read from, so a checkpoint is only
+    reused while that part of the input is unchanged. 'report_offset' is the size the
+    daily report had at that point, which is where a resumed run truncates and appends.
+    """
+
+    __slots__ = ("path", "exact", "touched", "last_date", "rows", "report_offset", "digest", "lot_count")
+
+    def __init__(self, path, exact, touched, last_date, rows, report_offset, digest, lot_count):
+        self.path = path
+        self.exact = exact
+        self.touched = touched
+        self.last_date = last_date
+        self.rows = rows
+        self.report_offset = report_offset
+        self.digest = digest
+        self.lot_count = lot_count
+
+    def load_lots(self):
+        """Read the lot stack stored in this checkpoint."""
+        with open(self.path, "rb") as f:
+            f.seek(_HEADER.size)
+            return LotStack.from_bytes(f.read(), self.lot_count, exact=self.exact)
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        data = f.read(_HEADER.size)
+    if len(data) < _HEADER.size:
+        return None
+    magic, exact, touched, last_date, rows, report_offset, digest, lot_count = _HEADER.unpack(data)
+    if magic != MAGIC:
+        return None
+    return Checkpoint(path, exact, touched, last_date.rstrip(b"\0").decode(), rows, report_offset, digest, lot_count)
+
+
+def list_checkpoints(directory):
+    """Checkpoints in 'directory', oldest (fewest rows) first."""
+    if not os.path.isdir(directory):
+        return []
+    checkpoints = []
+    for name in os.listdir(directory):
+        if name.endswith(_SUFFIX):
+            checkpoint = _read_header(os.path.join(directory, name))
+            if checkpoint is None:
+                logger.warning(f"Ignoring unreadable checkpoint {name}")
+            else:
+                checkpoints.append(checkpoint)
+    return sorted(checkpoints, key=lambda c: c.rows)
+
+
+def save_checkpoint(directory, lots, touched, last_date, rows, report_offset, digest):
+    """Write the state after 'rows' input rows; the file is replaced atomically."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{rows:012d}{_SUFFIX}")
+    header = _HEADER.pack(
+        MAGIC, lots.exact, touched, last_date.encode()[:10], rows, report_offset, digest, len(lots)
+    )
+    with open(path + ".tmp", "wb") as f:
+        f.write(header)
+        f.write(lots.to_bytes())
+    os.replace(path + ".tmp", path)
+    logger.debug(f"Checkpoint after {rows} rows ({last_date}): {len(lots)} lots")
+
+
+def discard_after(directory, rows):
+    """Remove checkpoints taken after 'rows' rows; their input prefix has changed."""
+    for checkpoint in list_checkpoints(directory):
+        if checkpoint.rows > rows:
+            os.remove(checkpoint.path)
+
+
+def fast_forward(rows, digest, checkpoints):
+    """
+    Skip the input rows covered by the newest usable checkpoint.
+
+    'rows' must be read through hashed_lines(..., digest). Checkpoints (oldest first)
+    are checked in turn: one is usable if the input digest after its row count still
+    matches, i.e. nothing up to there changed. Rows read past the last usable one are
+    buffered, so the input is still read only once.
+
+    Returns (checkpoint or None, iterator over the rows still to process).
+    """
+    resumed, pending, seen = None, [], 0
+    for checkpoint in checkpoints:
+        while seen < checkpoint.rows:
+            row = next(rows, None)
+            if row is None:
+                break
+            pending.append(row)
+            seen += 1
+        if seen != checkpoint.rows or digest.digest() != checkpoint.digest:
+            # Back-dated or changed data: everything from here on is replayed
+            break
+        resumed, pending = checkpoint, []
+    return resumed, chain(pending, rows)
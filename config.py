@@ -0,0 +1,92 @@
+"""
+Settings for the bittensor-lifo CLI, from a config file and/or the environment.
+
+The file is TOML (.toml) or JSON, given with --config or $BITTENSOR_LIFO_CONFIG;
+every key is optional and replaces the matching read_all_new global:
+
+    api_key = "..."
+    wallets = ["5F...", "5G..."]
+    sell_wallets = ["5H..."]
+    store_path = "/data/bittensor_lifo.sqlite3"
+    output_format = "parquet"
+
+Each key can also be set as BITTENSOR_LIFO_<KEY> (e.g. BITTENSOR_LIFO_API_KEY, or
+BITTENSOR_LIFO_WALLETS="5F...,5G..."), which wins over the file.
+"""
+import json
+import os
+
+CONFIG_ENV = "BITTENSOR_LIFO_CONFIG"
+ENV_PREFIX = "BITTENSOR_LIFO_"
+
+
+def _list(value):
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+def _optional(value):
+    return value or None
+
+
+# Config key -> (read_all_new global, parser for file/env values)
+SETTINGS = {
+    "api_key": ("API_KEY", str),
+    "base_url": ("TAOSTATS_BASE_URL", str),
+    "wallets": ("_WALLETS", _list),
+    "sell_wallets": ("_SELL_WALLETS", _list),
+    "secondary_wallets": ("_SECONDARY_WALLETS", _list),
+    "store_path": ("STORE_PATH", str),
+    "requests_per_minute": ("REQUESTS_PER_MINUTE", float),
+    "requests_burst": ("REQUESTS_BURST", int),
+    "fetch_workers": ("FETCH_WORKERS", int),
+    "aggregation_engine": ("AGGREGATION_ENGINE", str),
+    "exact_mode": ("EXACT_MODE", _bool),
+    "streaming": ("STREAMING", _bool),
+    "wallet_csv_dir": ("WALLET_CSV_DIR", _optional),
+    "output_file": ("OUTPUT_FILE", str),
+    "output_format": ("OUTPUT_FORMAT", str),
+    "price_symbol": ("PRICE_SYMBOL", str),
+    "price_sources": ("PRICE_SOURCES", _list),
+}
+
+
+def _read_file(path):
+    if path.endswith(".toml"):
+        import tomllib
+
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_config(path=None):
+    """
+    Settings from 'path' (default: $BITTENSOR_LIFO_CONFIG, if set) overridden by the
+    environment, as {key: parsed value}. Only keys that are set anywhere are returned.
+    """
+    path = path or os.environ.get(CONFIG_ENV)
+    raw = _read_file(path) if path else {}
+    unknown = sorted(set(raw) - set(SETTINGS))
+    if unknown:
+        raise ValueError(f"Unknown setting(s) in {path}: {', '.join(unknown)}")
+
+    for key in SETTINGS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value is not None:
+            raw[key] = value
+    return {key: SETTINGS[key][1](value) for key, value in raw.items()}
+
+
+def apply_config(settings, module):
+    """Set the module globals named in SETTINGS (read_all_new) from 'settings'."""
+    for key, value in settings.items():
+        setattr(module, SETTINGS[key][0], value)
@@ -0,0 +1,59 @@
+"""
+Day handling shared by the pipeline.
+
+Internally a day is an integer ordinal (datetime.date.toordinal()), so "previous day"
+is d - 1 and sorting is integer sorting. The 'YYYY-MM-DDT00:00:00.00' string form is
+only produced at the boundaries (CSV files, the SQLite store). Parsing is cached, since
+the same timestamps and day keys come back over and over.
+"""
+from datetime import UTC, date, datetime
+from functools import lru_cache
+
+DAY_KEY_FORMAT = "%Y-%m-%dT00:00:00.00"
+_UNIX_EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=1 << 16)
+def timestamp_to_day(ts):
+    """API timestamp ('YYYY-MM-DDTHH:MM:SS[.fff]Z') -> day ordinal."""
+    return date.fromisoformat(ts[:10]).toordinal()
+
+
+@lru_cache(maxsize=1 << 16)
+def key_to_day(key):
+    """Day key ('YYYY-MM-DDT00:00:00.00') -> day ordinal."""
+    return date.fromisoformat(key[:10]).toordinal()
+
+
+@lru_cache(maxsize=1 << 16)
+def day_to_key(day):
+    """Day ordinal -> day key ('YYYY-MM-DDT00:00:00.00')."""
+    return date.fromordinal(day).strftime(DAY_KEY_FORMAT)
+
+
+def date_to_timestamp(value):
+    """'YYYY-MM-DD' -> Unix timestamp (seconds) of that day's UTC midnight."""
+    return (date.fromisoformat(value).toordinal() - _UNIX_EPOCH_DAY) * 86400
+
+
+def day_start_timestamp(day):
+    """Day ordinal -> Unix timestamp (seconds) of that day's midnight (UTC)."""
+    return (day - _UNIX_EPOCH_DAY) * 86400
+
+
+def day_end_timestamp(day):
+    """Day ordinal -> Unix timestamp (seconds) of that day's last second (UTC)."""
+    return (day - _UNIX_EPOCH_DAY + 1) * 86400 - 1
+
+
+def timestamp_to_unix(ts):
+    """API timestamp ('YYYY-MM-DDTHH:MM:SS[.fff]Z') -> Unix timestamp (seconds); naive means UTC."""
+    moment = datetime.fromisoformat(ts)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return int(moment.timestamp())
+
+
+def unix_to_date(timestamp):
+    """Unix timestamp (seconds) -> 'YYYY-MM-DD' of its UTC day."""
+    return date.fromordinal(timestamp // 86400 + _UNIX_EPOCH_DAY).isoformat()
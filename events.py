@@ -0,0 +1,85 @@
+"""
+Event-level pipeline: timestamped acquisitions and disposals instead of one netted
+row per day.
+
+An event is a plain tuple (timestamp, wallet_index, kind, quantity), so events sort
+by time with tuple comparison and no dict is built per event:
+
+    ACQUISITION  an inbound transfer from outside our wallets, at the transfer's
+                 timestamp; and what a wallet earned since its previous balance snapshot
+                 (balance change + outbound - inbound, as in the daily totals), at the
+                 start (00:00 UTC) of the day it is counted on, so it is in stock before
+                 that day's sales
+    DISPOSAL     one transfer to a sell wallet, at the transfer's timestamp
+
+Transfers between our own wallets are not acquisitions: the lots already are in the
+combined inventory. External inbound transfers are, which the daily totals leave out.
+
+Each wallet's events come out in time order (wallet_events), so all wallets are
+interleaved with one heapq.merge (read_all_new.iter_events). read_lifo.replay_events
+then books them on an Inventory one by one, each priced at its own moment.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from amounts import RAO_PER_TAO
+from dates import day_end_timestamp, day_start_timestamp, key_to_day, timestamp_to_unix
+from transfer_index import INTERNAL, SELL
+
+# Event kinds; for the same timestamp and wallet an acquisition sorts before a disposal
+ACQUISITION = 0
+DISPOSAL = 1
+
+# Same clamps as the daily tables (read_all_new): received amounts of secondary
+# wallets above this are skipped, as are negative ones and any above RECEIVED_LIMIT
+SECONDARY_LIMIT = 2 * RAO_PER_TAO
+RECEIVED_LIMIT = 250 * RAO_PER_TAO
+
+
+def wallet_events(rows, wallet_index, index, secondary=False, exact=False):
+    """
+    Events of one wallet in time order. 'rows' are HistoryStore.iter_wallet_event_rows
+    tuples, 'index' the TransferIndex that tells sells and internal transfers apart.
+    Quantities are integer rao when 'exact' is set, TAO otherwise.
+    """
+    previous_day, previous_total = None, 0
+    for day_key, day_rows in groupby(rows, key=itemgetter(0)):
+        d = key_to_day(day_key)
+        # Times missing from the data fall at the end of their day
+        end_of_day = day_end_timestamp(d)
+        balance = 0
+        outbound = inbound = 0
+        events = []
+        for _, kind, timestamp, amount, source, destination in day_rows:
+            if kind == 0:
+                balance = amount or 0
+                continue
+            if kind == 1:
+                outbound += amount
+                if index.classify_addresses(source, destination) != SELL:
+                    continue
+                event_kind = DISPOSAL
+            else:
+                inbound += amount
+                if index.classify_addresses(source, destination) == INTERNAL:
+                    continue
+                event_kind = ACQUISITION
+            events.append((
+                timestamp_to_unix(timestamp) if timestamp else end_of_day, wallet_index, event_kind,
+                amount if exact else amount / RAO_PER_TAO,
+            ))
+
+        consecutive = previous_day == d - 1
+        received = balance - (previous_total if consecutive else 0) + outbound - inbound
+        if (secondary and received > SECONDARY_LIMIT) or received > RECEIVED_LIMIT or received < 0:
+            received = 0
+        if received:
+            # Earned since the previous snapshot; booked at the start of the day the
+            # daily totals count it on
+            events.append((
+                day_start_timestamp(d), wallet_index, ACQUISITION,
+                received if exact else received / RAO_PER_TAO,
+            ))
+        previous_day, previous_total = d, balance
+        events.sort()
+        yield from events
@@ -0,0 +1,236 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import metrics
+from http_client import ApiClient
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that are worth retrying (rate limited or transient server errors)
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    'rate_per_minute' tokens are added per minute, up to 'burst' tokens.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0  # tokens per second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = max(self._updated, now)
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                if now < self._updated:
+                    # We are inside a pause window set by block_for()
+                    delay = self._updated - now
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def block_for(self, seconds):
+        """
+        Empty the bucket and stop handing out tokens for 'seconds'.
+        Used when the server tells us we are going too fast (429 / Retry-After),
+        so every worker thread backs off, not just the one that got the 429.
+        """
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class RateLimitedFetcher:
+    """
+    Shared fetch engine for the taostats API.
+
+    Every request goes through one TokenBucket, so the total request rate matches
+    the API key's quota no matter how many worker threads are busy. 429 and 5xx
+    responses, and connection errors, are retried with exponential backoff (or the
+    server's Retry-After), here only. Requests share one pooled, keep-alive
+    http_client.ApiClient that does no retries of its own.
+    """
+
+    def __init__(self, headers, requests_per_minute, burst=1, max_workers=8,
+                 max_retries=5, backoff_base=2.0, backoff_max=120.0, timeout=30):
+        self.headers = headers
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        # Connection errors are retried by get_json's loop, not again inside the client
+        self.client = ApiClient(headers, pool_size=max_workers, timeout=timeout, connect_retries=0)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    def _backoff(self, attempt):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay + random.uniform(0, delay / 4)
+
+    def get_json(self, url):
+        """
+        GET 'url' and return the decoded JSON body, or None if it could not be fetched.
+        """
+        for attempt in range(self.max_retries + 1):
+            # No backoff after the last attempt: nothing follows it
+            last = attempt == self.max_retries
+            waited = time.perf_counter()
+            self.bucket.acquire()
+            started = time.perf_counter()
+            waited = started - waited
+            try:
+                response = self.client.get(url)
+            except requests.RequestException as e:
+                metrics.observe_request(url, time.perf_counter() - started, retry=not last, wait=waited)
+                if last:
+                    logger.warning(f"Request error for {url}: {e}.")
+                    continue
+                delay = self._backoff(attempt)
+                logger.warning(f"Request error for {url}: {e}. Retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            retry = response.status_code in _RETRY_STATUSES
+            metrics.observe_request(
+                url, time.perf_counter() - started, response.status_code, len(response.content), retry and not last,
+                waited,
+            )
+            if retry:
+                if last:
+                    logger.warning(f"HTTP {response.status_code} for {url}.")
+                    continue
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    f"HTTP {response.status_code} for {url} "
+                    f"(attempt {attempt + 1}/{self.max_retries + 1}). Backing off {delay:.1f}s"
+                )
+                if response.status_code == 429:
+                    self.bucket.block_for(delay)
+                else:
+                    time.sleep(delay)
+                continue
+
+            try:
+                return response.json()
+            except Exception as e:
+                logger.error(f"Error parsing JSON from {url}: {e}")
+                return None
+
+        logger.error(f"Giving up on {url} after {self.max_retries + 1} attempts.")
+        return None
+
+    def iter_many(self, jobs, is_old=None):
+        """
+        Fetch several paginated endpoints at once, yielding (key, page, rows) as pages arrive.
+
+        'jobs' maps a key to a function page_url(page) -> url. Page 1 of every job is
+        requested first; once it reports 'total_pages', pages 2..N are queued too.
+
+        'is_old' optionally maps a key to a predicate is_old(row). Those jobs are walked
+        page by page (newest first) and stop at the first page containing an old row;
+        old rows are dropped. This is what makes incremental syncs cheap.
+
+        Pages are yielded in completion order, not page order. A page that could not be
+        fetched (or had an unexpected structure) is yielded once as (key, page, None), so
+        callers can tell a complete job from one with gaps.
+        """
+        is_old = is_old or {}
+        pending = {}
+
+        def submit(key, page):
+            future = self._executor.submit(self.get_json, jobs[key](page))
+            pending[future] = (key, page)
+
+        for key in jobs:
+            submit(key, 1)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, page = pending.pop(future)
+                data_json = future.result()
+
+                if not data_json or "data" not in data_json or "pagination" not in data_json:
+                    logger.warning(f"Unexpected structure for {key} (page {page}). Raw response: {data_json}")
+                    yield key, page, None
+                    continue
+
+                total_pages = data_json["pagination"]["total_pages"]
+                rows = data_json["data"]
+
+                if key in is_old:
+                    new_rows = [row for row in rows if not is_old[key](row)]
+                    if len(new_rows) == len(rows) and page < total_pages:
+                        submit(key, page + 1)
+                    else:
+                        logger.debug(f"{key}: caught up after {page} page(s)")
+                    yield key, page, new_rows
+                    continue
+
+                if page == 1:
+                    logger.debug(f"{key}: {total_pages} pages")
+                    for next_page in range(2, total_pages + 1):
+                        submit(key, next_page)
+                yield key, page, rows
+
+    def fetch_many(self, jobs, is_old=None):
+        """
+        Like iter_many, but collects everything.
+        Returns {key: [page_1_data, page_2_data, ...]} in page order; pages that could
+        not be fetched are left out.
+        """
+        pages = {key: {} for key in jobs}
+        for key, page, rows in self.iter_many(jobs, is_old):
+            if rows is not None:
+                pages[key][page] = rows
+        return {key: [got[p] for p in sorted(got)] for key, got in pages.items()}
+
+    def fetch_paginated(self, page_url, is_old=None):
+        """Fetch every page (or only the new rows) of a single paginated endpoint."""
+        return self.fetch_many({"pages": page_url}, {"pages": is_old} if is_old else None)["pages"]
@@ -0,0 +1,94 @@
+"""
+Shared HTTP client for the taostats and exchange APIs.
+
+One requests.Session per host keeps connections alive, so thousands of paginated
+requests share a few TCP/TLS connections instead of opening one each. The pool is
+sized for the fetch engine's worker threads. Responses are requested compressed
+(gzip, plus br when a brotli decoder is installed).
+"""
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import brotli  # noqa: F401 (lets urllib3 decode "br")
+    _BROTLI = True
+except ImportError:  # optional dependency
+    try:
+        import brotlicffi  # noqa: F401
+        _BROTLI = True
+    except ImportError:
+        _BROTLI = False
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per host; at least the number of fetch worker threads
+POOL_SIZE = 16
+# Seconds to establish a connection / to wait for the response
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+# Retries of failed connections (refused, reset, DNS); HTTP statuses are handled separately
+CONNECT_RETRIES = 3
+
+ACCEPT_ENCODING = "gzip, deflate, br" if _BROTLI else "gzip, deflate"
+
+
+class ApiClient:
+    """
+    Pooled, compressed GETs.
+
+    'retry_statuses' are retried by the transport with exponential backoff, honouring
+    Retry-After. It is empty by default, because the fetch engine does its own status
+    retries through its token bucket; clients without such a loop (prices) pass
+    RETRY_STATUSES. Likewise 'connect_retries': the fetch engine passes 0 and retries
+    connection errors in its own loop, so they are not retried at both layers.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, headers=None, pool_size=None, timeout=None, retry_statuses=(), status_retries=3,
+                 connect_retries=CONNECT_RETRIES):
+        self.headers = dict(headers or {})
+        self.pool_size = pool_size or POOL_SIZE
+        self.timeout = (CONNECT_TIMEOUT, timeout or READ_TIMEOUT)
+        self.retry = Retry(
+            total=connect_retries + (status_retries if retry_statuses else 0),
+            connect=connect_retries,
+            read=0,
+            status=status_retries if retry_statuses else 0,
+            status_forcelist=retry_statuses,
+            backoff_factor=0.5,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            allowed_methods=["GET"],
+        )
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        """The pooled session for the host of 'url'."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=self.retry)
+                session.mount(host, adapter)
+                session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, **self.headers})
+                self._sessions[host] = session
+            return session
+
+    def get(self, url, params=None, headers=None):
+        """GET 'url' on the pooled session of its host."""
+        return self.session(url).get(url, params=params, headers=headers, timeout=self.timeout)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
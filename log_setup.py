@@ -0,0 +1,46 @@
+"""
+Logging configuration shared by the scripts.
+
+The level comes from the command line (--log-level) or the BITTENSOR_LIFO_LOG_LEVEL
+environment variable and defaults to INFO. Per-row and per-lot messages in the hot
+loops are guarded with isEnabledFor, so below DEBUG they cost nothing. To follow a
+long run without full DEBUG output, --trace-every N (or BITTENSOR_LIFO_TRACE_EVERY)
+logs every Nth row at INFO.
+"""
+import logging
+import os
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+LEVEL_ENV = "BITTENSOR_LIFO_LOG_LEVEL"
+TRACE_ENV = "BITTENSOR_LIFO_TRACE_EVERY"
+
+# Log every Nth row at INFO (0 = off); set by configure_logging
+TRACE_EVERY = 0
+
+
+def configure_logging(level=None, trace_every=None):
+    """Set up console logging; arguments left as None fall back to the environment."""
+    global TRACE_EVERY
+    level = (level or os.environ.get(LEVEL_ENV) or "INFO").upper()
+    logging.basicConfig(level=level, format=LOG_FORMAT, handlers=[logging.StreamHandler()])
+    TRACE_EVERY = trace_every if trace_every is not None else int(os.environ.get(TRACE_ENV) or 0)
+
+
+def add_logging_arguments(parser):
+    parser.add_argument("--log-level", help=f"DEBUG, INFO, WARNING, ... (default: ${LEVEL_ENV} or INFO)")
+    parser.add_argument(
+        "--trace-every", type=int,
+        help=f"log every Nth processed row at INFO (default: ${TRACE_ENV} or off)",
+    )
+
+
+def row_logging(logger):
+    """
+    Return (level, every) for per-row messages: every row at DEBUG when DEBUG is on,
+    otherwise every TRACE_EVERY-th row at INFO, or (None, 0) when rows are not logged.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        return logging.DEBUG, 1
+    if TRACE_EVERY and logger.isEnabledFor(logging.INFO):
+        return logging.INFO, TRACE_EVERY
+    return None, 0
@@ -0,0 +1,191 @@
+"""
+Memory-mapped LIFO lot journal for exact mode.
+
+Lots are fixed-width records in a file that is mapped into memory, so memory use stays
+flat however many lots a ledger has, and reopening a journal maps the file without
+reading or parsing its lots. Records are only ever appended; a sale lowers 'remaining'
+in place, starting at the newest lot that has something left ('top') and following the
+'prev' links down, so lots that are used up are never visited again.
+
+It has the push/take/total API of the lots.py engines and gives the same results as an
+exact LotStack; read_lifo.Inventory can run on it directly (--lot-journal).
+
+Like a checkpoint (checkpoint.py), the header records how far into a ledger the lots
+are: the input rows booked, the digest of the input lines they came from and the daily
+report size at that point. A later run whose input still starts with those lines
+carries on from there instead of rebuilding the journal.
+"""
+import mmap
+import os
+import struct
+
+MAGIC = b"LIFOJRN2"
+# magic, record count, open lot count, top record (-1 = none), total quantity (rao),
+# total cost (rao * micro-USD, a 128-bit signed integer), input rows booked, report size,
+# input digest, last date (YYYY-MM-DD)
+_HEADER = struct.Struct("<8sqqqq16sqq32s10s")
+_HEADER_SIZE = 128
+# timestamp (Unix seconds), wallet id, quantity (rao), price (micro-USD), remaining (rao), prev record
+_RECORD = struct.Struct("<qqqqqq")
+# The (price, remaining, prev) part of a record, which is all a sale reads
+_TAIL = struct.Struct("<qqq")
+_TAIL_OFFSET = 24
+_REMAINING = struct.Struct("<q")
+_REMAINING_OFFSET = 32
+
+# Records the file grows by at least (it then doubles)
+_MIN_CAPACITY = 4096
+
+
+class LotJournal:
+    """
+    LIFO lots in the journal file at 'path'. An existing journal is reopened as it is,
+    unless 'reset' is set; a new one is created otherwise. Use as a context manager (or
+    call close()) so the header is written back.
+    """
+
+    __slots__ = (
+        "path", "zero", "count", "open_lots", "top", "total_quantity", "total_cost",
+        "rows", "report_offset", "digest", "last_date", "_file", "_map",
+    )
+
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.zero = 0
+        exists = not reset and os.path.exists(path) and os.path.getsize(path) >= _HEADER_SIZE
+        self._file = open(path, "r+b" if exists else "w+b")
+        if exists:
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            (magic, self.count, self.open_lots, self.top, self.total_quantity, cost,
+             self.rows, self.report_offset, self.digest, last_date) = _HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                self._map.close()
+                self._file.close()
+                raise ValueError(f"{path} is not a lot journal")
+            self.total_cost = int.from_bytes(cost, "little", signed=True)
+            self.last_date = last_date.rstrip(b"\0").decode()
+        else:
+            self._file.truncate(_HEADER_SIZE + _MIN_CAPACITY * _RECORD.size)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+            self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        """Number of lots with something left."""
+        return self.open_lots
+
+    def __iter__(self):
+        """Yield (remaining, price) of the open lots from the oldest to the newest."""
+        return ((remaining, price) for _, _, _, price, remaining, _ in self.records(open_only=True))
+
+    def records(self, open_only=False):
+        """
+        Yield (timestamp, wallet_id, quantity, price, remaining, prev) records in file
+        order; with 'open_only', only the lots that have something left.
+        """
+        unpack, size, mm = _RECORD.unpack_from, _RECORD.size, self._map
+        for i in range(self.count):
+            record = unpack(mm, _HEADER_SIZE + i * size)
+            if record[4] or not open_only:
+                yield record
+
+    def reset(self):
+        """Drop every lot and the ledger position; the file keeps its size."""
+        self.count = self.open_lots = 0
+        self.top = -1
+        self.total_quantity = self.total_cost = 0
+        self.mark(0, "", 0, b"")
+
+    def mark(self, rows, last_date, report_offset, digest):
+        """
+        Record the ledger position the lots belong to (see the module docstring) and
+        flush. A run marks 0 rows before it changes any lot, so one that is interrupted
+        leaves a journal the next run rebuilds.
+        """
+        self.rows, self.last_date, self.report_offset, self.digest = rows, last_date, report_offset, digest
+        self.flush()
+
+    def _grow(self):
+        capacity = (len(self._map) - _HEADER_SIZE) // _RECORD.size
+        self._map.close()
+        self._file.truncate(_HEADER_SIZE + max(capacity * 2, _MIN_CAPACITY) * _RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def push(self, quantity, price, timestamp=0, wallet_id=0):
+        """Append a new lot on top of the stack."""
+        offset = _HEADER_SIZE + self.count * _RECORD.size
+        if offset + _RECORD.size > len(self._map):
+            self._grow()
+        _RECORD.pack_into(self._map, offset, timestamp, wallet_id, quantity, price, quantity, self.top)
+        self.top = self.count
+        self.count += 1
+        self.open_lots += 1
+        self.total_quantity += quantity
+        self.total_cost += quantity * price
+
+    def clear(self):
+        """Use up every open lot."""
+        mm, top = self._map, self.top
+        while top >= 0:
+            offset = _HEADER_SIZE + top * _RECORD.size
+            _REMAINING.pack_into(mm, offset + _REMAINING_OFFSET, 0)
+            top = _TAIL.unpack_from(mm, offset + _TAIL_OFFSET)[2]
+        self.top = -1
+        self.open_lots = 0
+        self.total_quantity = self.total_cost = 0
+
+    def take(self, quantity):
+        """
+        Remove 'quantity' units from the top of the stack (LIFO).
+        Returns (cogs, quantity_taken); quantity_taken is less than 'quantity'
+        only if the stack runs out.
+        """
+        if quantity <= 0 or not self.open_lots:
+            return 0, 0
+        if quantity >= self.total_quantity:
+            cogs, taken = self.total_cost, self.total_quantity
+            self.clear()
+            return cogs, taken
+
+        mm, top = self._map, self.top
+        cogs, left = 0, quantity
+        while True:
+            offset = _HEADER_SIZE + top * _RECORD.size
+            price, remaining, prev = _TAIL.unpack_from(mm, offset + _TAIL_OFFSET)
+            if remaining > left:
+                cogs += left * price
+                _REMAINING.pack_into(mm, offset + _REMAINING_OFFSET, remaining - left)
+                break
+            cogs += remaining * price
+            left -= remaining
+            _REMAINING.pack_into(mm, offset + _REMAINING_OFFSET, 0)
+            self.open_lots -= 1
+            top = prev
+            if not left:
+                break
+
+        self.top = top
+        self.total_quantity -= quantity
+        self.total_cost -= cogs
+        return cogs, quantity
+
+    def flush(self):
+        """Write the header and flush the mapping to disk."""
+        _HEADER.pack_into(
+            self._map, 0, MAGIC, self.count, self.open_lots, self.top, self.total_quantity,
+            self.total_cost.to_bytes(16, "little", signed=True),
+            self.rows, self.report_offset, self.digest, self.last_date.encode()[:10],
+        )
+        self._map.flush()
+
+    def close(self):
+        if self._map.closed:
+            return
+        self.flush()
+        self._map.close()
+        self._file.close()
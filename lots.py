@@ -0,0 +1,236 @@
+import heapq
+from array import array
+from collections import deque
+from operator import itemgetter
+
+
+class Lot:
+    """One LIFO lot: 'quantity' left of it and its unit 'price'."""
+
+    __slots__ = ("quantity", "price")
+
+    def __init__(self, quantity, price):
+        self.quantity = quantity
+        self.price = price
+
+
+class LotStack:
+    """
+    LIFO lots: a deque of Lot records, sales pop from the right. Each lot is popped at
+    most once, so a sale costs amortized O(1) per lot it uses up.
+
+    The totals are running sums kept in plain attributes. Float sales subtract lot by
+    lot, in the same order as the original deque Inventory, so reports stay bit-identical.
+    With 'exact' set, quantities (rao) and prices (micro-USD) are ints and every sum is exact.
+    """
+
+    __slots__ = ("lots", "exact", "zero", "total_quantity", "total_cost")
+
+    def __init__(self, exact=False):
+        self.lots = deque()
+        self.exact = exact
+        self.zero = 0 if exact else 0.0
+        self.total_quantity = self.zero
+        self.total_cost = self.zero
+
+    def __len__(self):
+        return len(self.lots)
+
+    def __iter__(self):
+        """Yield (quantity, price) from the oldest lot to the newest."""
+        return ((lot.quantity, lot.price) for lot in self.lots)
+
+    def push(self, quantity, price):
+        """Add a new lot on top of the stack."""
+        self.lots.append(Lot(quantity, price))
+        self.total_quantity += quantity
+        self.total_cost += quantity * price
+
+    def clear(self):
+        self.lots.clear()
+        self.total_quantity = self.zero
+        self.total_cost = self.zero
+
+    def take(self, quantity):
+        """
+        Remove 'quantity' units from the top of the stack (LIFO).
+        Returns (cogs, quantity_taken); quantity_taken is less than 'quantity'
+        only if the stack runs out. Nothing taken is an integer (0, 0), as in the
+        original deque Inventory, so float reports still print 0 for such days.
+        """
+        lots = self.lots
+        if quantity <= 0 or not lots:
+            return 0, 0
+
+        cogs, remaining, total = 0, quantity, self.total_quantity
+        while remaining > 0 and lots:
+            lot = lots[-1]
+            lot_quantity = lot.quantity
+            if lot_quantity <= remaining:
+                cogs += lot_quantity * lot.price
+                remaining -= lot_quantity
+                total -= lot_quantity
+                lots.pop()
+            else:
+                cogs += remaining * lot.price
+                lot.quantity = lot_quantity - remaining
+                total -= remaining
+                remaining = 0
+
+        self.total_quantity = total
+        # An empty stack has no cost left, whatever float rounding says
+        self.total_cost = self.total_cost - cogs if lots else self.zero
+        return cogs, quantity - remaining
+
+    def to_bytes(self):
+        """
+        Serialize the stack: quantities, then prices; float stacks also keep their running
+        totals, so a restored stack continues with bit-identical results.
+        """
+        typecode = "q" if self.exact else "d"
+        data = array(typecode, (lot.quantity for lot in self.lots)).tobytes()
+        data += array(typecode, (lot.price for lot in self.lots)).tobytes()
+        if not self.exact:
+            data += array("d", (self.total_quantity, self.total_cost)).tobytes()
+        return data
+
+    @classmethod
+    def from_bytes(cls, data, count, exact=False):
+        """Rebuild a stack of 'count' lots written by to_bytes."""
+        stack = cls(exact=exact)
+        typecode = "q" if exact else "d"
+        values = array(typecode)
+        values.frombytes(data[:2 * count * values.itemsize])
+        for quantity, price in zip(values[:count], values[count:]):
+            stack.push(quantity, price)
+        if not exact:
+            totals = array("d")
+            totals.frombytes(data[2 * count * values.itemsize:][:2 * totals.itemsize])
+            stack.total_quantity, stack.total_cost = totals
+        return stack
+
+
+class _RunningLots:
+    """
+    Shared part of the non-LIFO engines: lots are [quantity, price] lists, the totals
+    are kept as running sums, and a sale consumes whatever lot _top() names first.
+    """
+
+    __slots__ = ("zero", "total_quantity", "total_cost")
+
+    def __init__(self, exact=False):
+        self.zero = 0 if exact else 0.0
+        self.total_quantity = self.zero
+        self.total_cost = self.zero
+
+    def push(self, quantity, price):
+        """Add a new lot."""
+        self.total_quantity += quantity
+        self.total_cost += quantity * price
+        self._add([quantity, price])
+
+    def clear(self):
+        self._clear()
+        self.total_quantity = self.zero
+        self.total_cost = self.zero
+
+    def _consume(self, lot, quantity):
+        """Take up to 'quantity' from 'lot'; returns (cogs, taken, lot_is_empty)."""
+        if lot[0] <= quantity:
+            return lot[0] * lot[1], lot[0], True
+        lot[0] -= quantity
+        return quantity * lot[1], quantity, False
+
+    def take(self, quantity):
+        """
+        Remove 'quantity' units in this engine's order.
+        Returns (cogs, quantity_taken); quantity_taken is less than 'quantity'
+        only if the lots run out. Nothing taken is an integer (0, 0), as in LotStack.
+        """
+        if quantity <= 0 or not len(self):
+            return 0, 0
+        if quantity >= self.total_quantity:
+            cogs, taken = self.total_cost, self.total_quantity
+            self.clear()
+            return cogs, taken
+
+        cogs, remaining = self.zero, quantity
+        while remaining > 0 and len(self):
+            lot_cogs, taken, empty = self._consume(self._top(), remaining)
+            if empty:
+                self._pop()
+            cogs += lot_cogs
+            remaining -= taken
+
+        self.total_quantity -= quantity
+        self.total_cost -= cogs
+        return cogs, quantity
+
+
+class LotQueue(_RunningLots):
+    """FIFO lots: a deque, sales consume the oldest lot first."""
+
+    __slots__ = ("lots",)
+
+    def __init__(self, exact=False):
+        super().__init__(exact)
+        self.lots = deque()
+
+    def __len__(self):
+        return len(self.lots)
+
+    def __iter__(self):
+        """Yield (quantity, price) from the oldest lot to the newest."""
+        return (tuple(lot) for lot in self.lots)
+
+    def _add(self, lot):
+        self.lots.append(lot)
+
+    def _clear(self):
+        self.lots.clear()
+
+    def _top(self):
+        return self.lots[0]
+
+    def _pop(self):
+        self.lots.popleft()
+
+
+class LotHeap(_RunningLots):
+    """HIFO lots: a heap keyed by price, sales consume the most expensive lot first."""
+
+    __slots__ = ("heap", "_seq")
+
+    def __init__(self, exact=False):
+        super().__init__(exact)
+        self.heap = []
+        self._seq = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __iter__(self):
+        """Yield (quantity, price) from the oldest lot to the newest."""
+        return (tuple(lot) for _, _, lot in sorted(self.heap, key=itemgetter(1)))
+
+    def _add(self, lot):
+        # Equal prices go oldest first; the sequence number also keeps lots out of comparisons
+        heapq.heappush(self.heap, (-lot[1], self._seq, lot))
+        self._seq += 1
+
+    def _clear(self):
+        self.heap.clear()
+
+    def _top(self):
+        return self.heap[0][2]
+
+    def _pop(self):
+        heapq.heappop(self.heap)
+
+
+# Cost-basis methods by name; every engine has the same push/take/total API
+COST_BASIS_ENGINES = {
+    "lifo": LotStack,
+    "fifo": LotQueue,
+    "hifo": LotHeap,
+}
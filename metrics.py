@@ -0,0 +1,235 @@
+"""
+Run metrics: per-stage wall/CPU time, per-endpoint HTTP statistics and counters.
+
+Everything is recorded into one module-level registry that is cheap to update and
+thread-safe (the fetch engine records from its worker threads). At the end of a run
+the scripts can write it as a JSON summary and/or a Prometheus textfile (for the
+node_exporter textfile collector). One stage can be profiled with cProfile, or with
+pyinstrument if it is installed (imported only then).
+
+    with metrics.stage("aggregation"):
+        ...
+    metrics.count("rows", n)
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the HTTP latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_PREFIX = "bittensor_lifo"
+
+# Stage to profile ("" = none) and the profiler to use ("cprofile" or "pyinstrument")
+PROFILE_STAGE = ""
+PROFILER = "cprofile"
+
+_lock = threading.Lock()
+_stages = {}
+_counters = {}
+_http = {}
+_started = time.time()
+
+
+def reset():
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _http.clear()
+        _started = time.time()
+
+
+def configure(profile_stage=None, profiler=None):
+    global PROFILE_STAGE, PROFILER
+    if profile_stage is not None:
+        PROFILE_STAGE = profile_stage
+    if profiler is not None:
+        PROFILER = profiler
+
+
+def count(name, n=1):
+    """Add 'n' to counter 'name'."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def endpoint_of(url):
+    """Endpoint label for a URL: host and path, without the query string."""
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def observe_request(url, seconds, status=None, size=0, retry=False, wait=0.0):
+    """
+    Record one HTTP attempt. 'status' is None for connection errors, 'size' the body
+    size in bytes, 'retry' whether the attempt is being retried, 'wait' the time spent
+    waiting for the rate limiter before it.
+    """
+    endpoint = endpoint_of(url)
+    with _lock:
+        stats = _http.get(endpoint)
+        if stats is None:
+            stats = _http[endpoint] = {
+                "requests": 0, "retries": 0, "bytes": 0, "seconds": 0.0, "rate_limit_wait_seconds": 0.0,
+                "statuses": {}, "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+        stats["requests"] += 1
+        stats["retries"] += bool(retry)
+        stats["bytes"] += size
+        stats["seconds"] += seconds
+        stats["rate_limit_wait_seconds"] += wait
+        key = str(status) if status is not None else "error"
+        stats["statuses"][key] = stats["statuses"].get(key, 0) + 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+                break
+        else:
+            stats["buckets"][-1] += 1
+
+
+@contextmanager
+def stage(name):
+    """Time a stage (wall and CPU); repeated stages accumulate."""
+    profiler = _start_profiler() if name == PROFILE_STAGE else None
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if profiler is not None:
+            _stop_profiler(profiler, name)
+        with _lock:
+            stats = _stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "runs": 0})
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            stats["runs"] += 1
+
+
+def _start_profiler():
+    if PROFILER == "pyinstrument":
+        try:
+            import pyinstrument
+        except ImportError:  # optional dependency
+            logger.warning("pyinstrument is not installed; profiling with cProfile instead.")
+        else:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, name):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(f"profile_{name}.prof")
+    else:
+        profiler.stop()
+        with open(f"profile_{name}.html", "w") as f:
+            f.write(profiler.output_html())
+
+
+def snapshot():
+    """All metrics as a JSON-serializable dict."""
+    with _lock:
+        http = {}
+        for endpoint, stats in _http.items():
+            cumulative, buckets = 0, {}
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), stats["buckets"]):
+                cumulative += n
+                buckets[str(bound)] = cumulative
+            http[endpoint] = {**stats, "statuses": dict(stats["statuses"]), "buckets": buckets}
+        return {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_started)),
+            "elapsed_seconds": time.time() - _started,
+            "stages": {name: dict(stats) for name, stats in _stages.items()},
+            "http": http,
+            "counters": dict(_counters),
+        }
+
+
+def _write_atomic(path, text):
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
+
+
+def write_json(path):
+    _write_atomic(path, json.dumps(snapshot(), indent=2) + "\n")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def prometheus_text(job):
+    """Metrics in the Prometheus text exposition format, labelled with job="<job>"."""
+    data = snapshot()
+    p = PROMETHEUS_PREFIX
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in {"job": job, **labels}.items())
+            lines.append(f"{p}_{name}{suffix}{{{label_text}}} {value}")
+
+    stages = data["stages"]
+    family("stage_wall_seconds", "gauge", "Wall-clock time per stage.",
+           [("", {"stage": s}, v["wall_seconds"]) for s, v in stages.items()])
+    family("stage_cpu_seconds", "gauge", "CPU time per stage.",
+           [("", {"stage": s}, v["cpu_seconds"]) for s, v in stages.items()])
+
+    http = data["http"]
+    family("http_requests_total", "counter", "HTTP requests (attempts) per endpoint and status.",
+           [("", {"endpoint": e, "status": status}, n)
+            for e, v in http.items() for status, n in v["statuses"].items()])
+    family("http_retries_total", "counter", "HTTP attempts that were retried.",
+           [("", {"endpoint": e}, v["retries"]) for e, v in http.items()])
+    family("http_response_bytes_total", "counter", "HTTP response body bytes.",
+           [("", {"endpoint": e}, v["bytes"]) for e, v in http.items()])
+    family("http_rate_limit_wait_seconds_total", "counter", "Time spent waiting for the rate limiter.",
+           [("", {"endpoint": e}, v["rate_limit_wait_seconds"]) for e, v in http.items()])
+    samples = []
+    for e, v in http.items():
+        samples += [("_bucket", {"endpoint": e, "le": le}, n) for le, n in v["buckets"].items()]
+        samples += [("_sum", {"endpoint": e}, v["seconds"]), ("_count", {"endpoint": e}, v["requests"])]
+    family("http_request_duration_seconds", "histogram", "HTTP request latency.", samples)
+
+    for name, value in sorted(data["counters"].items()):
+        family(f"{name}_total", "counter", f"Count of {name.replace('_', ' ')}.", [("", {}, value)])
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, job):
+    _write_atomic(path, prometheus_text(job))
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-json", help="write a JSON metrics summary to this file")
+    parser.add_argument("--metrics-prom", help="write metrics as a Prometheus textfile")
+    parser.add_argument("--profile-stage", help="profile one stage (writes profile_<stage>.prof)")
+    parser.add_argument(
+        "--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+        help="profiler for --profile-stage (pyinstrument writes profile_<stage>.html)",
+    )
+
+
+def export(args, job):
+    """Write the exports requested on the command line (see add_metrics_arguments)."""
+    if args.metrics_json:
+        write_json(args.metrics_json)
+    if args.metrics_prom:
+        write_prometheus(args.metrics_prom, job)
@@ -0,0 +1,210 @@
+import logging
+import time
+from bisect import bisect_right
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Exchanges serving Binance-style klines: [open_time_ms, open, high, low, close, volume, ...]
+KLINE_SOURCES = {
+    "mexc": {
+        "url": "https://api.mexc.com/api/v3/klines",
+        "max_limit": 1000,
+        "intervals": {"1h": "60m", "4h": "4h", "1d": "1d"},
+    },
+    "binance": {
+        "url": "https://api.binance.com/api/v3/klines",
+        "max_limit": 1000,
+        "intervals": {"1h": "1h", "4h": "4h", "1d": "1d"},
+    },
+}
+
+INTERVAL_MS = {
+    "1h": 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+}
+
+
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [start, end] ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def _missing_ranges(start_ms, end_ms, covered):
+    """Parts of [start_ms, end_ms] not inside any of the (merged, sorted) 'covered' ranges."""
+    missing = []
+    cursor = start_ms
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end_ms:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start - 1))
+        cursor = max(cursor, c_end + 1)
+    if cursor <= end_ms:
+        missing.append((cursor, end_ms))
+    return missing
+
+
+class PriceSeries:
+    """
+    Candle closes sorted by open time, with bisect lookups.
+    price_at(ts) returns the close of the candle that contains 'ts'.
+    """
+
+    def __init__(self, open_times, closes, interval):
+        self.open_times = open_times
+        self.closes = closes
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+
+    def __len__(self):
+        return len(self.open_times)
+
+    def price_at(self, ts_ms, default=None):
+        i = bisect_right(self.open_times, ts_ms) - 1
+        if i < 0 or ts_ms >= self.open_times[i] + self.interval_ms:
+            return default
+        return self.closes[i]
+
+
+class PriceCache:
+    """
+    Persistent candle cache on top of the HistoryStore 'prices' table.
+
+    Candles are keyed by (source, symbol, interval, open_time). The store also remembers
+    which time ranges were already fetched, so a run only requests the missing windows,
+    paging through ranges longer than one request allows. The still-open last candle is
+    never marked as fetched, so its close gets refreshed on the next run.
+    """
+
+    def __init__(self, store, symbol="TAOUSDT", interval="1d", sources=("mexc",), timeout=30, client=None):
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Unsupported interval {interval!r}; choose one of {sorted(INTERVAL_MS)}")
+        self.store = store
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.sources = list(sources)
+        self.timeout = timeout
+        self._client = client
+
+    @property
+    def client(self):
+        """HTTP client, created on first fetch (a fully cached run never imports requests)."""
+        if self._client is None:
+            from http_client import ApiClient
+            self._client = ApiClient(timeout=self.timeout, retry_statuses=ApiClient.RETRY_STATUSES)
+        return self._client
+
+    def _fetch_window(self, source, start_ms, end_ms):
+        """Page through [start_ms, end_ms] on 'source'. Returns candle tuples."""
+        config = KLINE_SOURCES[source]
+        limit = config["max_limit"]
+        candles = []
+        cursor = start_ms
+
+        while cursor <= end_ms:
+            params = {
+                "symbol": self.symbol,
+                "interval": config["intervals"][self.interval],
+                "startTime": cursor,
+                "endTime": end_ms,
+                "limit": limit,
+            }
+            started = time.perf_counter()
+            response = self.client.get(config["url"], params=params)
+            metrics.observe_request(
+                config["url"], time.perf_counter() - started, response.status_code, len(response.content)
+            )
+            data = response.json()
+            if not isinstance(data, list):
+                raise ValueError(f"Unexpected kline response from {source}: {data}")
+            if not data:
+                break
+
+            for entry in data:
+                candles.append((
+                    int(entry[0]), float(entry[1]), float(entry[2]),
+                    float(entry[3]), float(entry[4]), float(entry[5]),
+                ))
+
+            if len(data) < limit:
+                break
+            cursor = int(data[-1][0]) + self.interval_ms
+
+        return candles
+
+    def fill(self, start_ms, end_ms):
+        """
+        Fetch whatever part of [start_ms, end_ms] is not cached yet. Each missing window is
+        requested from the first source; later sources are only tried if that fails or
+        returns no candles. Only windows that got candles are recorded as covered.
+        """
+        # Candles open on interval boundaries; start on one so the first candle isn't skipped
+        start_ms = (start_ms // self.interval_ms) * self.interval_ms
+        # Candles whose close is still moving are never considered cached
+        last_closed_ms = (int(time.time() * 1000) // self.interval_ms) * self.interval_ms - 1
+
+        coverage = {
+            source: self.store.load_price_coverage(source, self.symbol, self.interval)
+            for source in self.sources
+        }
+        covered = _merge_ranges([r for ranges in coverage.values() for r in ranges])
+        missing = _missing_ranges(start_ms, end_ms, covered)
+        if not missing:
+            logger.debug(f"Prices {self.symbol}/{self.interval} already cached.")
+            return
+
+        for window_start, window_end in missing:
+            for source in self.sources:
+                logger.debug(
+                    f"Fetching {source} {self.symbol} {self.interval} candles "
+                    f"for [{window_start}, {window_end}]..."
+                )
+                try:
+                    candles = self._fetch_window(source, window_start, window_end)
+                except Exception as e:
+                    logger.warning(f"Could not fetch prices from {source}: {e}")
+                    continue
+
+                if not candles:
+                    # Nothing to cache; leave the window open for the next source or run
+                    logger.warning(f"{source} returned no candles for [{window_start}, {window_end}].")
+                    continue
+
+                self.store.save_prices(source, self.symbol, self.interval, candles)
+                if window_start <= last_closed_ms:
+                    coverage[source].append((window_start, min(window_end, last_closed_ms)))
+                break
+            else:
+                logger.error(f"No price source could serve [{window_start}, {window_end}].")
+
+        for source, ranges in coverage.items():
+            self.store.save_price_coverage(source, self.symbol, self.interval, _merge_ranges(ranges))
+        self.store.commit()
+
+    def candles(self, start_ms=None, end_ms=None):
+        """
+        Cached candles (open_time_ms, open, high, low, close, volume) ordered by open time.
+        Where several sources have a candle for the same open time, the first source wins.
+        """
+        by_open_time = {}
+        for source in reversed(self.sources):
+            for candle in self.store.load_prices(source, self.symbol, self.interval, start_ms, end_ms):
+                by_open_time[candle[0]] = candle
+        return [by_open_time[t] for t in sorted(by_open_time)]
+
+    def series(self, start_ms=None, end_ms=None):
+        """PriceSeries of cached closes for bisect lookups by timestamp."""
+        candles = self.candles(start_ms, end_ms)
+        return PriceSeries([c[0] for c in candles], [c[4] for c in candles], self.interval)
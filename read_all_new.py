@@ -1,20 +1,70 @@
+import argparse
 import json
-import time
 import traceback
-from datetime import datetime, timedelta, UTC
-import csv
-import requests
+from datetime import datetime, UTC
+import heapq
 import logging
+import os
+from itertools import groupby
+from operator import itemgetter
+
+import metrics
+from log_setup import add_logging_arguments, configure_logging, row_logging
+from blocks import BlockTimestampResolver
+from amounts import RAO_PER_TAO, format_usd, price_to_fixed
+from dates import day_to_key, key_to_day, timestamp_to_day
+from events import wallet_events
+from prices import PriceCache
+from store import HistoryStore
+from tables import FORMATS, TableWriter, with_format
+from transfer_index import TransferIndex
+from sync_state import advance_cursor, cursors_from_final_data, older_than
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.DEBUG,  # You can switch to INFO if logs are too verbose
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[logging.StreamHandler()]  # console only; you could add a FileHandler
-)
 
 API_KEY = "TAOSTATS_API"
+TAOSTATS_BASE_URL = "https://api.taostats.io"
+
+# Request quota of your taostats API key. All fetches share one token bucket,
+# so total wall-clock time depends on this quota rather than on fixed sleeps.
+REQUESTS_PER_MINUTE = 5
+REQUESTS_BURST = 1
+FETCH_WORKERS = 8
+
+_FETCHER = None
+
+# Local SQLite store for balances, transfers, prices and per-stream sync cursors
+STORE_PATH = "bittensor_lifo.sqlite3"
+
+# "python" or "numpy". The NumPy engine aggregates all wallets at once and
+# produces the same numbers; it needs numpy installed.
+AGGREGATION_ENGINE = "python"
+
+# Price history: cached locally, fetched from the first source that answers
+PRICE_SYMBOL = "TAOUSDT"
+PRICE_SOURCES = ["mexc", "binance"]
+PRICE_HISTORY_START = datetime(2023, 11, 1, tzinfo=UTC)
+# Candles the event pipeline prices each acquisition and sale with ('bittensor-lifo events')
+EVENT_PRICE_INTERVAL = "1h"
+
+# Exact mode keeps quantities as integer rao and prices as integer micro-USD
+# all the way to data_total_final2.csv (read_lifo picks the mode up from its header).
+EXACT_MODE = False
+
+# Streaming mode reads each wallet's history from the store one day at a time and
+# writes a CSV row as soon as that day is complete, so memory stays flat no matter
+# how long the history is. Output is identical to the default (batch) mode, which
+# loads whole histories and can use the NumPy engine.
+STREAMING = False
+
+# If set, also write one CSV per wallet into this directory, for per-wallet LIFO books
+# ('python3 read_lifo.py --wallet-dir wallet_data')
+WALLET_CSV_DIR = None
+
+# "csv" (default), "csv.gz", "csv.zst", "parquet" or "arrow"; see tables.py.
+# The columnar formats need pyarrow, csv.zst needs zstandard.
+OUTPUT_FORMAT = "csv"
+OUTPUT_FILE = "data_total_final2.csv"
 
 _SECONDARY_WALLETS = [
     # Example: "5FEXAMPLE..."
@@ -35,60 +85,64 @@ def remove_value_from_list(value, lst):
     return lst
 
 
-def get_historical_tao_prices():
-    """Fetch TAO price data from MEXC (TAOUSDT)."""
-    logger.debug("Fetching historical TAO prices from MEXC...")
-    symbol = "TAOUSDT"
-    interval = "1d"
-    start_time = datetime(2023, 11, 1)  # Example start date
-    end_time = datetime.now()
-
-    url = "https://api.mexc.com/api/v3/klines"
-    params = {"symbol": symbol, "interval": interval, "limit": 1000}
-
-    if start_time:
-        params["startTime"] = int(start_time.timestamp() * 1000)
-    if end_time:
-        params["endTime"] = int(end_time.timestamp() * 1000)
-
-    response = requests.get(url, params=params)
-    data = response.json()
+def get_historical_tao_prices(store, interval="1d", fetch=True):
+    """
+    TAO price candles (TAOUSDT) from the local price cache.
+    Only windows that are not cached yet are fetched (MEXC first, then fallbacks);
+    with fetch=False nothing is fetched and only cached candles are returned.
+    """
+    logger.debug("Loading historical TAO prices...")
+    cache = PriceCache(store, symbol=PRICE_SYMBOL, interval=interval, sources=PRICE_SOURCES)
+    start_ms = int(PRICE_HISTORY_START.timestamp() * 1000)
+    end_ms = int(datetime.now(UTC).timestamp() * 1000)
+    if fetch:
+        cache.fill(start_ms, end_ms)
 
     historical_data = []
-    for entry in data:
+    for open_time, open_, high, low, close, volume in cache.candles(start_ms, end_ms):
         historical_data.append({
-            "timestamp": datetime.fromtimestamp(entry[0] / 1000, UTC),
-            "open": float(entry[1]),
-            "high": float(entry[2]),
-            "low": float(entry[3]),
-            "close": float(entry[4]),
-            "volume": float(entry[5]),
+            "timestamp": datetime.fromtimestamp(open_time / 1000, UTC),
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
         })
 
-    logger.debug(f"Fetched {len(historical_data)} days of price data.")
+    logger.debug(f"Loaded {len(historical_data)} {interval} candles of price data.")
     return historical_data
 
 
+def get_event_prices(store, fetch=True):
+    """
+    price_at(unix_seconds) over the EVENT_PRICE_INTERVAL candles: the close of the candle
+    the moment falls in (integer micro-USD in exact mode), or 0 where there is none.
+    """
+    cache = PriceCache(store, symbol=PRICE_SYMBOL, interval=EVENT_PRICE_INTERVAL, sources=PRICE_SOURCES)
+    start_ms = int(PRICE_HISTORY_START.timestamp() * 1000)
+    end_ms = int(datetime.now(UTC).timestamp() * 1000)
+    if fetch:
+        cache.fill(start_ms, end_ms)
+    series = cache.series(start_ms, end_ms)
+    if EXACT_MODE:
+        series.closes = [price_to_fixed(close) for close in series.closes]
+    no_price = 0 if EXACT_MODE else 0.0
+    logger.debug(f"Loaded {len(series)} {EVENT_PRICE_INTERVAL} candles for event pricing.")
+
+    def price_at(timestamp):
+        return series.price_at(timestamp * 1000, no_price)
+
+    return price_at
+
+
 def subtract_one_day(day):
-    """Subtract one day from a string datetime in ISO format."""
-    try:
-        dt = datetime.strptime(day, "%Y-%m-%dT%H:%M:%S.%f")
-    except ValueError:
-        dt = datetime.strptime(day, "%Y-%m-%dT%H:%M:%S")
-    new_dt = dt - timedelta(days=1)
-    new_timestamp = new_dt.strftime("%Y-%m-%dT00:00:00.00")
-    return new_timestamp
+    """Subtract one day from a day key ('YYYY-MM-DDT00:00:00.00')."""
+    return day_to_key(key_to_day(day) - 1)
 
 
 def add_one_day(day):
-    """Add one day to a string datetime in ISO format."""
-    try:
-        dt = datetime.strptime(day, "%Y-%m-%dT%H:%M:%S.%f")
-    except ValueError:
-        dt = datetime.strptime(day, "%Y-%m-%dT%H:%M:%S")
-    new_dt = dt + timedelta(days=1)
-    new_timestamp = new_dt.strftime("%Y-%m-%dT00:00:00.00")
-    return new_timestamp
+    """Add one day to a day key ('YYYY-MM-DDT00:00:00.00')."""
+    return day_to_key(key_to_day(day) + 1)
 
 
 def convert_to_tao(rao):
@@ -98,345 +152,544 @@ def convert_to_tao(rao):
 
 def format_date(ts):
     """Format the timestamp to 'YYYY-MM-DDT00:00:00.00'."""
-    try:
-        dt = datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.%fZ')
-    except Exception:
-        dt = datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ")
-    return dt.strftime("%Y-%m-%dT00:00:00.00")
+    return day_to_key(timestamp_to_day(ts))
+
+
+def _get_fetcher():
+    """Create the shared taostats fetch engine on first use."""
+    global _FETCHER
+    if _FETCHER is None:
+        # Imported here so runs on cached data never load requests
+        from fetch_engine import RateLimitedFetcher
+
+        headers = {"accept": "application/json", "Authorization": API_KEY}
+        _FETCHER = RateLimitedFetcher(
+            headers,
+            requests_per_minute=REQUESTS_PER_MINUTE,
+            burst=REQUESTS_BURST,
+            max_workers=FETCH_WORKERS,
+        )
+    return _FETCHER
+
+
+def _balances_page_url(wallet):
+    return lambda page: f"{TAOSTATS_BASE_URL}/api/account/history/v1?address={wallet}&page={page}&limit=200"
+
+
+def _transfers_page_url(wallet, outbound):
+    side = "from" if outbound else "to"
+    return lambda page: f"{TAOSTATS_BASE_URL}/api/transfer/v1?address={wallet}&{side}={wallet}&page={page}&limit=200"
 
 
 def get_wallet_historical_balances(wallet):
     """
     Retrieve historical balances for a specific wallet (taostats.io).
-    Uses pagination, waiting 30s between pages to avoid rate limits.
+    Pages 2..N are fetched in parallel once page 1 reports total_pages.
     """
     logger.info(f"Fetching historical balances for wallet: {wallet}")
-    headers = {"accept": "application/json", "Authorization": API_KEY}
+    all_nodes = _get_fetcher().fetch_paginated(_balances_page_url(wallet))
+    logger.debug(f"Fetched historical balances for wallet {wallet}. Pages: {len(all_nodes)}")
+    return all_nodes
 
-    all_nodes = []
-    page = 1
-    max_pages = 0
 
-    while True:
-        logger.debug(f"Sleep 30s before next API request for balances (page {page})...")
-        time.sleep(30)
-        url = f"https://api.taostats.io/api/account/history/v1?address={wallet}&page={page}&limit=200"
-        response = requests.get(url, headers=headers)
+def get_wallet_transfers(wallet, outbound=True):
+    """
+    Retrieve transfer records (inbound/outbound) for a given wallet (taostats.io).
+    Pages 2..N are fetched in parallel once page 1 reports total_pages.
+    """
+    direction = "outbound" if outbound else "inbound"
+    logger.info(f"Fetching {direction} transfers for wallet: {wallet}")
+    all_nodes = _get_fetcher().fetch_paginated(_transfers_page_url(wallet, outbound))
+    logger.debug(f"Fetched {direction} transfers for wallet {wallet}. Pages: {len(all_nodes)}")
+    return all_nodes
 
-        try:
-            data_json = response.json()
-        except Exception as e:
-            logger.error(f"Error parsing JSON (balances): {e}")
-            break
 
-        if "data" not in data_json or "pagination" not in data_json:
-            logger.warning(f"Unexpected structure (balances). Raw response: {data_json}")
-            break
+def _wallet_jobs(wallets, cursors):
+    """Fetch jobs for every (wallet, stream), plus 'is_old' predicates for streams with a cursor."""
+    jobs = {}
+    is_old = {}
+    for wallet in wallets:
+        jobs[(wallet, "balances")] = _balances_page_url(wallet)
+        jobs[(wallet, "outbound")] = _transfers_page_url(wallet, outbound=True)
+        jobs[(wallet, "inbound")] = _transfers_page_url(wallet, outbound=False)
 
-        # Set max_pages only once (unless it's 0, in which case we break immediately)
-        if max_pages == 0:
-            max_pages = data_json["pagination"]["total_pages"]
-            logger.debug(f"Max pages for balance history: {max_pages}")
+        for stream, cursor in cursors.get(wallet, {}).items():
+            if cursor:
+                is_old[(wallet, stream)] = older_than(cursor)
 
-            # FIX: If total_pages=0, break to avoid infinite loop
-            if max_pages == 0:
-                logger.debug(f"No historical balance pages for wallet {wallet}. Breaking loop.")
-                break
+    logger.info(
+        f"Fetching balances and transfers for {len(wallets)} wallet(s) "
+        f"({len(is_old)} of {len(jobs)} streams incremental)..."
+    )
+    return jobs, is_old
 
-        all_nodes.append(data_json["data"])
 
-        if page == max_pages:
-            break
-        page += 1
+def sync_wallets(store, wallets):
+    """
+    Bring the store up to date for 'wallets'.
+    Each page goes into the store as soon as it arrives instead of being collected
+    first. Cursors are saved together with the last rows, in the final commit, so an
+    interrupted sync is simply fetched again (rows are upserted) on the next run.
+    A stream with a page that could not be fetched keeps its old cursor, so the whole
+    range is fetched again next time instead of leaving a gap behind the cursor.
+    Returns the number of pages fetched.
+    """
+    cursors = store.load_cursors()
+
+    for wallet in wallets:
+        if wallet not in cursors:
+            legacy_cursors = import_legacy_json(store, wallet, f"historical_data_{wallet}.json")
+            if legacy_cursors:
+                cursors[wallet] = legacy_cursors
+
+    # Fetch only what is newer than each stream's cursor (or everything for new wallets)
+    jobs, is_old = _wallet_jobs(wallets, cursors)
+    new_cursors = {}
+    failed = set()
+    pages_seen = rows_seen = 0
+    for (wallet, stream), page, rows in _get_fetcher().iter_many(jobs, is_old):
+        if rows is None:
+            failed.add((wallet, stream))
+            continue
+        if stream == "balances":
+            save_wallet_pages(store, wallet, [rows], [], [])
+        else:
+            save_wallet_pages(store, wallet, [], [rows], [])
+        key = (wallet, stream)
+        new_cursors[key] = advance_cursor(new_cursors.get(key, cursors.get(wallet, {}).get(stream)), rows)
+        pages_seen += 1
+        rows_seen += len(rows)
+
+    for (wallet, stream), cursor in new_cursors.items():
+        if (wallet, stream) not in failed:
+            cursors.setdefault(wallet, {})[stream] = cursor
+    for wallet, stream in sorted(failed):
+        logger.error(f"Wallet {wallet}: {stream} incomplete, its cursor is kept and the range is fetched again next run.")
+    for wallet in wallets:
+        store.save_cursors(wallet, cursors.get(wallet, {}))
+    # Rows and their cursors are committed together
+    store.commit()
+    metrics.count("pages_fetched", pages_seen)
+    metrics.count("rows_fetched", rows_seen)
+    metrics.count("streams_incomplete", len(failed))
+    logger.info(f"Synced {len(wallets)} wallet(s) from {pages_seen} page(s).")
+    return pages_seen
+
+
+def save_wallet_pages(store, wallet, account_balances, wallet_outbound_extrinsics, wallet_inbound_extrinsics):
+    """Tag fetched rows with their day and bulk-insert them into the store."""
+    balance_rows = [row for page in account_balances for row in page]
+    transfer_rows = [row for pages in (wallet_outbound_extrinsics, wallet_inbound_extrinsics)
+                     for page in pages for row in page]
+    for row in balance_rows:
+        row["day"] = format_date(row["timestamp"])
+    for row in transfer_rows:
+        row["day"] = format_date(row["timestamp"])
+    store.save_balances(wallet, balance_rows)
+    store.save_transfers(transfer_rows)
+
+
+def import_legacy_json(store, wallet, file_path):
+    """
+    One-time import of a historical_data_{wallet}.json cache written by older versions.
+    Returns the cursors derived from it, or None if there is no such file.
+    """
+    try:
+        with open(file_path, "r") as file:
+            final_data = json.load(file)
+    except Exception:
+        return None
 
-    logger.debug(f"Fetched historical balances for wallet {wallet}. Pages: {max_pages}")
-    return all_nodes
+    logger.info(f"Importing legacy JSON cache {file_path} into {STORE_PATH}...")
+    balance_rows, transfer_rows = [], []
+    for day, row in final_data.items():
+        if "balance_total" in row:
+            balance_rows.append({**row, "day": day})
+        for transfer in row.get("transfers", []) + row.get("inbound_transfers", []):
+            transfer_rows.append({**transfer, "day": day})
+    store.save_balances(wallet, balance_rows)
+    store.save_transfers(transfer_rows)
+    return cursors_from_final_data(final_data)
 
 
-def get_wallet_transfers(wallet, outbound=True):
+def get_block_timestamps(blocks, interpolate=False, store=None):
     """
-    Retrieve transfer records (inbound/outbound) for a given wallet (taostats.io).
-    Uses pagination, waiting 30s between pages to avoid rate limits.
+    Resolve many block numbers to timestamps at once (see blocks.BlockTimestampResolver).
+    Results are cached in the local store, so repeated lookups cost no requests.
     """
-    headers = {"accept": "application/json", "Authorization": API_KEY}
-    direction = "outbound" if outbound else "inbound"
-    logger.info(f"Fetching {direction} transfers for wallet: {wallet}")
+    own_store = store is None
+    if own_store:
+        store = HistoryStore(STORE_PATH)
+    try:
+        resolver = BlockTimestampResolver(store, _get_fetcher(), TAOSTATS_BASE_URL)
+        return resolver.resolve(blocks, interpolate=interpolate)
+    finally:
+        if own_store:
+            store.close()
 
-    all_nodes = []
-    page = 1
-    max_pages = 0
 
-    while True:
-        logger.debug(f"Sleep 30s before next API request for transfers (page {page})...")
-        time.sleep(30)
+def get_block_height_timestamp(block):
+    """
+    Retrieve timestamp for a given block using taostats.io.
+    """
+    logger.debug(f"Fetching timestamp for block {block}...")
+    return get_block_timestamps([block]).get(int(block))
 
-        if outbound:
-            url = f"https://api.taostats.io/api/transfer/v1?address={wallet}&from={wallet}&page={page}&limit=200"
-        else:
-            url = f"https://api.taostats.io/api/transfer/v1?address={wallet}&to={wallet}&page={page}&limit=200"
 
-        response = requests.get(url, headers=headers)
+def transfer_index():
+    """A TransferIndex over the configured wallet, sell and secondary sets."""
+    return TransferIndex(_WALLETS, _SELL_WALLETS, _SECONDARY_WALLETS)
 
-        try:
-            data_json = response.json()
-        except Exception as e:
-            logger.error(f"Error parsing JSON for transfers: {e}")
-            break
 
-        if "data" not in data_json or "pagination" not in data_json:
-            logger.warning(f"Unexpected structure for transfers. Response: {data_json}")
-            break
+def iter_day_totals(ck, days, exact=False, index=None):
+    """
+    Per-day totals for one wallet (pure-Python engine), computed on the fly.
+    'days' yields (day_ordinal, record) in day order, e.g. HistoryStore.iter_wallet_days;
+    only the previous day's total is kept, so this runs in constant memory.
+    Yields (day, {"day_total", "total_transferred", "received", "sold_transferred"}) in TAO,
+    or in integer rao when 'exact' is set. Transfers are de-duplicated and classified
+    through 'index' (a TransferIndex, by default a new one over the configured wallets).
+    """
+    convert = int if exact else convert_to_tao
+    index = transfer_index() if index is None else index
+    previous_day, previous_total = None, 0
+    level, every = row_logging(logger)
+
+    for days_read, (d, r) in enumerate(days, start=1):
+        # Outbound, sold (sent to a sell wallet) and inbound sums
+        totaled_transfer, sold_transfer, inbound_transfers = index.day_sums(
+            r.get("transfers", ()), r.get("inbound_transfers", ())
+        )
+
+        if every and days_read % every == 0:
+            logger.log(
+                level, "Wallet %s - Day %s: Outbound=%s, Sold=%s, Inbound=%s",
+                ck, day_to_key(d), totaled_transfer, sold_transfer, inbound_transfers,
+            )
 
-        if max_pages == 0:
-            max_pages = data_json["pagination"]["total_pages"]
-            logger.debug(f"Max pages for {direction} transfers: {max_pages}")
+        # Attempt to get day_total from the JSON structure
+        try:
+            balance_total = int(r["balance_total"])
+        except KeyError:
+            balance_total = 0
 
-            # FIX: If total_pages=0, break to avoid infinite loop (page never equals 0)
-            if max_pages == 0:
-                logger.debug(f"No {direction} transfers at all for wallet {wallet}. Breaking loop.")
-                break
+        # day_total is the wallet's total balance on that day
+        day_total = convert(balance_total)
 
-        all_nodes.append(data_json["data"])
+        # Compare to previous day (days are integer ordinals, so that is d - 1)
+        previous_received = previous_total if previous_day == d - 1 else 0
 
-        if page == max_pages:
-            break
-        page += 1
+        today_diff = day_total - previous_received
 
-    logger.debug(f"Fetched {direction} transfers for wallet {wallet}. Pages: {max_pages}")
-    return all_nodes
+        yield d, {
+            "day_total": day_total,
+            "total_transferred": convert(totaled_transfer) - convert(inbound_transfers),
+            "received": today_diff
+                        + convert(totaled_transfer)
+                        - convert(inbound_transfers),
+            "sold_transferred": convert(sold_transfer),
+        }
+        previous_day, previous_total = d, day_total
 
 
-def get_block_height_timestamp(block):
+def compute_day_totals(ck, final_data, exact=False, index=None):
     """
-    Retrieve timestamp for a given block using taostats.io.
+    Build the per-day totals for one wallet (pure-Python engine).
+    'final_data' is keyed by day ordinal (see dates.py).
+    Returns {day: {"day_total", "total_transferred", "received", "sold_transferred"}}.
     """
-    headers = {"accept": "application/json", "Authorization": API_KEY}
-    url = f"https://api.taostats.io/api/block/v1?block_number={block}"
+    return dict(iter_day_totals(ck, sorted(final_data.items()), exact=exact, index=index))
 
-    logger.debug(f"Fetching timestamp for block {block}...")
-    response = requests.get(url, headers=headers)
 
+def _wallet_totals_worker(store_path, ck, index, exact):
+    """Process-pool task: read one wallet from its own store connection and total its days."""
+    store = HistoryStore(store_path)
     try:
-        data_json = response.json()
-        if "data" in data_json and len(data_json["data"]) > 0:
-            return data_json["data"][0]["timestamp"]
-    except Exception as e:
-        logger.error(f"Error parsing JSON when fetching block timestamp: {e}")
+        return dict(iter_day_totals(ck, store.iter_wallet_days(ck), exact=exact, index=index))
+    finally:
+        store.close()
 
-    return None
 
+def aggregate_wallets_parallel(store_path, wallets, workers):
+    """
+    Build {wallet: {day: totals}} with one process-pool task per wallet.
+    Workers read straight from the SQLite store, so no history is pickled over;
+    results come back in wallet order, which keeps the combined sums identical
+    to a serial run.
+    """
+    logger.info(f"Aggregating daily totals for {len(wallets)} wallet(s) with {workers} worker processes...")
+    # Each worker fills its own copy of the (empty) index
+    index = transfer_index()
+    # multiprocessing is slow to import, so only load it when it is used
+    from concurrent.futures import ProcessPoolExecutor
 
-# ---------------------------
-# Main logic to gather data
-# ---------------------------
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_wallet_totals_worker, store_path, ck, index, EXACT_MODE)
+            for ck in wallets
+        ]
+        return {ck: future.result() for ck, future in zip(wallets, futures)}
 
-def main():
-    logger.info("Starting data-gathering process...")
-    all_final_data = {}
 
-    # This will store combined daily data from all wallets
-    all_final_data_total = {}
-    all_final_data_combined = {}
+def aggregate_wallets(store, wallets, workers=1, index=None):
+    """
+    Load every wallet's history from the store and build {wallet: {day: totals}}.
+    With workers > 1 the pure-Python engine runs one wallet per process.
+    'index' is the TransferIndex shared by all wallets (a new one by default).
+    """
+    if workers > 1 and AGGREGATION_ENGINE != "numpy":
+        return aggregate_wallets_parallel(store.path, wallets, workers)
 
-    if not _WALLETS:
-        logger.warning("No wallets in _WALLETS. You must populate _WALLETS for data to be collected.")
-    else:
-        # Get data for each wallet
-        for w_idx, _WALLET in enumerate(_WALLETS, start=1):
-            logger.info(f"Processing wallet #{w_idx}/{len(_WALLETS)}: {_WALLET}")
-
-            final_data = {}
-            file_path = f"historical_data_{_WALLET}.json"
-
-            try:
-                with open(file_path, "r") as file:
-                    final_data = json.load(file)
-                    logger.debug(f"Loaded existing JSON for {_WALLET}.")
-            except Exception:
-                logger.debug(f"JSON file {file_path} doesn't exist; fetching new data for {_WALLET}.")
-                account_balances = get_wallet_historical_balances(_WALLET)
-                wallet_outbound_extrinsics = get_wallet_transfers(_WALLET, outbound=True)
-                wallet_inbound_extrinsics = get_wallet_transfers(_WALLET, outbound=False)
-
-                # Merge into final_data
-                for account_balance_page in account_balances:
-                    for row in account_balance_page:
-                        formatted_date = format_date(row["timestamp"])
-                        row["day"] = formatted_date
-                        final_data[formatted_date] = row
-
-                for transfers_page in wallet_outbound_extrinsics:
-                    for row in transfers_page:
-                        day = format_date(row["timestamp"])
-                        if day not in final_data:
-                            final_data[day] = {}
-                        if "transfers" not in final_data[day]:
-                            final_data[day]["transfers"] = []
-                        final_data[day]["transfers"].append(row)
-
-                for inbound_page in wallet_inbound_extrinsics:
-                    for row in inbound_page:
-                        day = format_date(row["timestamp"])
-                        if day not in final_data:
-                            final_data[day] = {}
-                        if "inbound_transfers" not in final_data[day]:
-                            final_data[day]["inbound_transfers"] = []
-                        final_data[day]["inbound_transfers"].append(row)
-
-                # Write the final_data to a JSON file for caching
-                with open(file_path, "w") as file:
-                    json.dump(final_data, file, indent=4)
-                logger.info(f"Wrote new JSON data to {file_path}")
-
-            all_final_data[_WALLET] = final_data
-
-        # Process final_data for each wallet to build daily totals
-        for ck, final_data in all_final_data.items():
-            # Sort by date string
-            sorted_final_data = dict(sorted(
-                final_data.items(),
-                key=lambda item: datetime.strptime(item[0], "%Y-%m-%dT%H:%M:%S.%f")
-            ))
-            final_day_total = {}
-            leftover_transfers_day = {}
-            leftover_sold_day = {}
-            leftover_inbound_transfer_day = {}
-
-            for d, r in sorted_final_data.items():
-                # Summaries
-                totaled_transfer = 0
-                sold_transfer = 0
-                inbound_transfers = 0
-
-                subtracted_day = subtract_one_day(d)
-
-                # Outbound transfers
-                if "transfers" in r:
-                    # Potentially we compare times with r["timestamp"] if needed
-                    totaled_transfer = sum(int(i["amount"]) for i in r["transfers"])
-                    sold_transfer = sum(
-                        int(i["amount"]) for i in r["transfers"]
-                        if i.get("to", {}).get("ss58") in _SELL_WALLETS
-                    )
-
-                # Inbound transfers
-                if "inbound_transfers" in r:
-                    inbound_transfers = sum(int(i["amount"]) for i in r["inbound_transfers"])
-
-                logger.debug(
-                    f"Wallet {ck} - Day {d}: Outbound={totaled_transfer}, "
-                    f"Sold={sold_transfer}, Inbound={inbound_transfers}"
-                )
-
-                # Combine leftover logic from previous day
-                if subtracted_day in leftover_transfers_day:
-                    totaled_transfer += leftover_transfers_day[subtracted_day]
-                    sold_transfer += leftover_sold_day[subtracted_day]
-                if subtracted_day in leftover_inbound_transfer_day:
-                    inbound_transfers += leftover_inbound_transfer_day[subtracted_day]
-
-                # Attempt to get day_total from the JSON structure
-                try:
-                    balance_total = int(r["balance_total"])
-                except KeyError:
-                    balance_total = 0
-
-                # day_total is the wallet's total balance on that day
-                day_total = balance_total
-
-                # Compare to previous day
-                try:
-                    previous_received = final_day_total[subtracted_day]["day_total"]
-                except KeyError:
-                    previous_received = 0
-
-                today_diff = convert_to_tao(day_total) - previous_received
-
-                final_day_total[d] = {
-                    "day_total": convert_to_tao(day_total),
-                    "total_transferred": convert_to_tao(totaled_transfer) - convert_to_tao(inbound_transfers),
-                    "received": today_diff
-                                + convert_to_tao(totaled_transfer)
-                                - convert_to_tao(inbound_transfers),
-                    "sold_transferred": convert_to_tao(sold_transfer),
+    index = transfer_index() if index is None else index
+    all_final_data = {wallet: store.load_final_data(wallet) for wallet in wallets}
+
+    if AGGREGATION_ENGINE == "numpy":
+        import vector_aggregation  # loads numpy, so only for this engine
+    if AGGREGATION_ENGINE == "numpy" and vector_aggregation.available():
+        logger.info("Aggregating daily totals with the NumPy engine...")
+        return vector_aggregation.compute_all_day_totals(all_final_data, index, exact=EXACT_MODE)
+
+    if AGGREGATION_ENGINE == "numpy":
+        logger.warning("NumPy is not installed; falling back to the pure-Python aggregation engine.")
+    return {
+        ck: compute_day_totals(ck, final_data, exact=EXACT_MODE, index=index)
+        for ck, final_data in all_final_data.items()
+    }
+
+
+def record_transfer_classes(index):
+    """Log and count (see metrics.py) the distinct transfers per class in 'index'."""
+    counts = index.counts()
+    for cls, n in counts.items():
+        metrics.count(f"transfers_{cls}", n)
+    logger.info(
+        f"Transfers: {counts['sell']} sell, {counts['internal']} internal, {counts['external']} external."
+    )
+
+
+def _tag_days(w_idx, ck, day_totals):
+    for d, total in day_totals:
+        yield d, w_idx, ck, total
+
+
+def _clamp_secondary(ck, total):
+    """If 'ck' is a secondary wallet, skip large "received" values. Returns 'total'."""
+    if ck in _SECONDARY_WALLETS:
+        if total["received"] > (2 * RAO_PER_TAO if EXACT_MODE else 2):
+            total["received"] = 0 if EXACT_MODE else 0.0
+    return total
+
+
+def iter_combined_days(wallet_day_totals):
+    """
+    Combine per-wallet daily totals into one row per day.
+    'wallet_day_totals' maps wallet -> iterable of (day, totals) in day order. The streams
+    are merged by day and a day is yielded as soon as every wallet has moved past it;
+    within a day, wallets are added in mapping order.
+    Yields (day, {"received", "sold_transferred"}).
+    """
+    streams = [
+        _tag_days(w_idx, ck, day_totals.items() if isinstance(day_totals, dict) else day_totals)
+        for w_idx, (ck, day_totals) in enumerate(wallet_day_totals.items())
+    ]
+    for d, entries in groupby(heapq.merge(*streams, key=itemgetter(0, 1)), key=itemgetter(0)):
+        combined = None
+        for _, _, ck, total in entries:
+            total = _clamp_secondary(ck, total)
+
+            if combined is None:
+                combined = {
+                    "received": total["received"],
+                    "sold_transferred": total["sold_transferred"]
                 }
+            else:
+                combined["received"] += total["received"]
+                combined["sold_transferred"] += total["sold_transferred"]
+        yield d, combined
 
-            # Merge into all_final_data_total (by wallet)
-            all_final_data_total[ck] = final_day_total
-
-        # Combine across all wallets
-        for ck, v in all_final_data_total.items():
-            for d, total in v.items():
-                # If total["received"] < 0, we might clamp it or leave it as-is
-                if total["received"] < 0:
-                    # The original snippet might have set it to 0 or tried to fix it
-                    # We'll leave as-is or set to 0 if you prefer:
-                    pass
-
-                # If this wallet is a secondary wallet, skip large "received" values
-                if ck in _SECONDARY_WALLETS:
-                    if total["received"] > 2:
-                        total["received"] = 0.0
-
-                if d not in all_final_data_combined:
-                    all_final_data_combined[d] = {
-                        "received": total["received"],
-                        "sold_transferred": total["sold_transferred"]
-                    }
-                else:
-                    all_final_data_combined[d]["received"] += total["received"]
-                    all_final_data_combined[d]["sold_transferred"] += total["sold_transferred"]
-
-    # Grab historical TAO prices
-    logger.info("Fetching historical TAO prices to merge with daily data...")
-    historical_prices = get_historical_tao_prices()
+
+def iter_events(store, wallets, index=None):
+    """
+    Acquisition and disposal events of all 'wallets' in time order (see events.py):
+    each wallet's events are read from the store as they are needed and merged.
+    """
+    index = transfer_index() if index is None else index
+    return heapq.merge(*(
+        wallet_events(
+            store.iter_wallet_event_rows(ck), w_idx, index, secondary=ck in _SECONDARY_WALLETS, exact=EXACT_MODE
+        )
+        for w_idx, ck in enumerate(wallets)
+    ))
+
+
+def get_price_map(store, fetch=True):
+    """Daily TAO close keyed by day ordinal (integer micro-USD in exact mode)."""
     price_map = {}
-    for hp in historical_prices:
-        # Key by date in the same format: 'YYYY-MM-DDT00:00:00.00'
-        key_str = hp["timestamp"].strftime("%Y-%m-%dT00:00:00.00")
-        price_map[key_str] = hp["close"]
-
-    # Merge prices into the combined data
-    for date_str in all_final_data_combined.keys():
-        if date_str in price_map:
-            all_final_data_combined[date_str]["tao_price"] = price_map[date_str]
-        else:
-            all_final_data_combined[date_str]["tao_price"] = 0.0  # or None if you prefer
+    for hp in get_historical_tao_prices(store, fetch=fetch):
+        # Key by day ordinal, like the combined data
+        price_map[hp["timestamp"].date().toordinal()] = price_to_fixed(hp["close"]) if EXACT_MODE else hp["close"]
+    return price_map
 
-    # Write CSV
-    csv_file_path = "data_total_final2.csv"
-    logger.info(f"Writing combined data to {csv_file_path}...")
-    try:
-        with open(csv_file_path, "w", newline="") as csv_file:
-            writer = csv.writer(csv_file)
-            header = ["timestamp", "received", "sold", "price", "total_received ($)", "total sold ($)"]
-            writer.writerow(header)
-
-            # Sort dates
-            sorted_dates = sorted(
-                all_final_data_combined.keys(),
-                key=lambda d: datetime.strptime(d, "%Y-%m-%dT%H:%M:%S.%f")
-            )
 
-            for timestamp in sorted_dates:
-                metrics = all_final_data_combined[timestamp]
-                received_val = metrics.get("received", 0)
-                sold_val = metrics.get("sold_transferred", 0)
-                price_val = metrics.get("tao_price", 0)
+def write_combined_table(path, combined_days, price_map):
+    """
+    Write (day, combined totals) rows, in the order given, with their TAO price.
+    The file format follows the extension of 'path' (see tables.py).
+    """
+    if EXACT_MODE:
+        header = ["timestamp", "received_rao", "sold_rao", "price_micro_usd", "total_received ($)", "total sold ($)"]
+        types = dict(zip(header, ["str", "int", "int", "int", "str", "str"]))
+    else:
+        header = ["timestamp", "received", "sold", "price", "total_received ($)", "total sold ($)"]
+        types = dict(zip(header, ["str", "float", "float", "float", "float", "float"]))
+
+    logger.info(f"Writing combined data to {path}...")
+    try:
+        with TableWriter(path, header, types) as writer:
+            received_limit = 250 * RAO_PER_TAO if EXACT_MODE else 250
+            no_price = 0 if EXACT_MODE else 0.0
+            rows_written = 0
+            for timestamp, totals in combined_days:
+                received_val = totals.get("received", 0)
+                sold_val = totals.get("sold_transferred", 0)
+                price_val = price_map.get(timestamp, no_price)
 
                 # Example clamp for large or negative 'received'
-                if received_val > 250 or received_val < 0:
+                if received_val > received_limit or received_val < 0:
                     received_val = 0
 
                 total_received_usd = received_val * price_val
                 total_sold_usd = sold_val * price_val
+                if EXACT_MODE:
+                    total_received_usd = format_usd(total_received_usd)
+                    total_sold_usd = format_usd(total_sold_usd)
 
-                row = [timestamp, received_val, sold_val, price_val, total_received_usd, total_sold_usd]
+                row = [day_to_key(timestamp), received_val, sold_val, price_val, total_received_usd, total_sold_usd]
                 writer.writerow(row)
+                rows_written += 1
 
-        logger.info(f"Done! Data written to {csv_file_path}")
+        metrics.count("table_rows_written", rows_written)
+        logger.info(f"Done! Data written to {path}")
     except Exception as e:
-        logger.error(f"Error writing to {csv_file_path}: {e}")
+        logger.error(f"Error writing to {path}: {e}")
+
+
+def write_wallet_tables(store, wallets, price_map, wallet_day_totals=None, index=None):
+    """
+    Write one table per wallet, in the data_total_final2 layout and OUTPUT_FORMAT, to
+    WALLET_CSV_DIR (the input of 'read_lifo.py --wallet-dir'). Totals already computed
+    in batch mode are reused; otherwise each wallet is streamed from the store again.
+    """
+    os.makedirs(WALLET_CSV_DIR, exist_ok=True)
+    for ck in wallets:
+        if wallet_day_totals is not None:
+            day_totals = wallet_day_totals[ck].items()
+        else:
+            day_totals = iter_day_totals(ck, store.iter_wallet_days(ck), exact=EXACT_MODE, index=index)
+        write_combined_table(
+            os.path.join(WALLET_CSV_DIR, ck + FORMATS[OUTPUT_FORMAT]),
+            ((d, _clamp_secondary(ck, total)) for d, total in day_totals),
+            price_map,
+        )
+
+
+# ---------------------------
+# Main logic to gather data
+# ---------------------------
+
+def fetch(store, event_prices=False):
+    """
+    Bring the store up to date: new wallet history pages and missing price candles
+    (with 'event_prices', also the EVENT_PRICE_INTERVAL ones).
+    """
+    if not _WALLETS:
+        logger.warning("No wallets in _WALLETS. You must populate _WALLETS for data to be collected.")
+    else:
+        with metrics.stage("sync"):
+            sync_wallets(store, _WALLETS)
+
+    logger.info("Fetching historical TAO prices...")
+    with metrics.stage("prices"):
+        get_historical_tao_prices(store)
+        if event_prices:
+            get_event_prices(store)
+
+
+def main(workers=1, sync=True):
+    """
+    Fetch (unless 'sync' is False, which only uses what is already in the store),
+    aggregate and write data_total_final2 plus the optional per-wallet tables.
+    """
+    logger.info("Starting data-gathering process...")
+    store = HistoryStore(STORE_PATH)
+
+    try:
+        if sync:
+            fetch(store)
+
+        with metrics.stage("prices"):
+            price_map = get_price_map(store, fetch=False)
+
+        # One index for all wallets, so a transfer between two of them is classified once
+        index = transfer_index()
+
+        # In streaming mode the totals are computed lazily, inside write_table
+        with metrics.stage("aggregation"):
+            if STREAMING:
+                # Each wallet's days are read from the store in order and totalled on the fly
+                logger.info("Streaming daily totals from the store...")
+                wallet_day_totals = {
+                    ck: iter_day_totals(ck, store.iter_wallet_days(ck), exact=EXACT_MODE, index=index)
+                    for ck in _WALLETS
+                }
+            else:
+                wallet_day_totals = aggregate_wallets(store, _WALLETS, workers=workers, index=index)
+
+        # Combine across all wallets and write each day out as soon as it is complete
+        with metrics.stage("write_table"):
+            write_combined_table(
+                with_format(OUTPUT_FILE, OUTPUT_FORMAT), iter_combined_days(wallet_day_totals), price_map
+            )
+
+        if WALLET_CSV_DIR and _WALLETS:
+            with metrics.stage("write_wallet_tables"):
+                write_wallet_tables(store, _WALLETS, price_map, None if STREAMING else wallet_day_totals, index)
+
+        # Parallel workers classify in their own processes, so there is nothing to report then
+        if len(index):
+            record_transfer_classes(index)
+    finally:
+        store.close()
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="processes for per-wallet aggregation (pure-Python engine; default 1 = serial)",
+    )
+    parser.add_argument(
+        "--format", choices=sorted(FORMATS),
+        help=f"output format of data_total_final2 and the per-wallet tables (default {OUTPUT_FORMAT})",
+    )
+
+
+def run(args, sync=True):
+    """Run main() for parsed arguments (see add_arguments); also used by the bittensor-lifo CLI."""
+    global OUTPUT_FORMAT
+    if args.format:
+        OUTPUT_FORMAT = args.format
+    try:
+        main(workers=args.workers, sync=sync)
+    finally:
+        metrics.export(args, "read_all_new")
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Fetch wallet history and write data_total_final2.csv.")
+    add_arguments(parser)
+    add_logging_arguments(parser)
+    metrics.add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.trace_every)
+    metrics.configure(args.profile_stage, args.profiler)
+    run(args)
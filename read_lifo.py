@@ -1,177 +1,898 @@
+import argparse
 import csv
-from collections import deque
 import logging
 import os
+from contextlib import ExitStack
+from datetime import date
+
+import metrics
+from amounts import format_percentage, format_price, format_tao, format_usd
+from checkpoint import discard_after, fast_forward, hashed_lines, list_checkpoints, new_digest, save_checkpoint
+from dates import date_to_timestamp, unix_to_date
+from events import ACQUISITION
+from log_setup import add_logging_arguments, configure_logging, row_logging
+from lot_journal import LotJournal
+from lots import COST_BASIS_ENGINES
+from reports import PERIODS, ReportEngine
+from tables import FORMATS, TableWriter, read_table, split_format, table_format, with_format
 
-# Configure logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    level=logging.DEBUG,  # Feel free to change to INFO to reduce verbosity
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[logging.StreamHandler()]  # console only
-)
+
+# With checkpoints enabled, inventory state is saved every this many input rows
+CHECKPOINT_EVERY = 30
 
 class Inventory:
-    def __init__(self):
-        # LIFO: pop from the right
-        self.inventory = deque()
-        self.current_inventory = 0
+    def __init__(self, exact=False, method="lifo", journal=None, wallet_id=0):
+        # LIFO by default: lots are taken from the top of the stack (see lots.LotStack).
+        # 'method' picks another cost-basis engine from lots.COST_BASIS_ENGINES.
+        # In exact mode quantities are integer rao and prices integer micro-USD.
+        # With a lot_journal.LotJournal as 'journal' (exact LIFO only), the lots live in
+        # that memory-mapped file instead, recorded with their date and 'wallet_id'.
+        self.method = method
+        self.journal = journal
+        self.wallet_id = wallet_id
+        if journal is None:
+            self.inventory = COST_BASIS_ENGINES[method](exact=exact)
+            self.current_inventory = 0
+        else:
+            if method != "lifo" or not exact:
+                raise ValueError("The lot journal only holds exact-mode LIFO lots")
+            self.inventory = journal
+            self.current_inventory = journal.total_quantity
 
-    def add_inventory(self, quantity, price):
+    def add_inventory(self, quantity, price, date=None):
         """
         Add 'quantity' units to the inventory at 'price' cost each.
+        'date' ("YYYY-MM-DD") is only recorded by a lot journal.
         """
-        self.inventory.append({"quantity": quantity, "price": price})
-        self.current_inventory += quantity
-        logger.debug(f"[add_inventory] Added => QTY: {quantity}, Price: {price}, New current: {self.current_inventory}")
+        if self.journal is not None:
+            timestamp = date_to_timestamp(date) if date and date != "N/A" else 0
+            self.add_lot(quantity, price, timestamp, self.wallet_id)
+            return
+        inventory = self.inventory
+        inventory.push(quantity, price)
+        self.current_inventory = inventory.total_quantity
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[add_inventory] Added => QTY: %s, Price: %s, New current: %s", quantity, price, self.current_inventory
+            )
+
+    def add_lot(self, quantity, price, timestamp=0, wallet_id=0):
+        """
+        add_inventory for a lot with a Unix 'timestamp' and a 'wallet_id' (the event
+        pipeline); only a lot journal records those two.
+        """
+        if self.journal is None:
+            self.inventory.push(quantity, price)
+        else:
+            self.inventory.push(quantity, price, timestamp, wallet_id)
+        self.current_inventory = self.inventory.total_quantity
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "[add_inventory] Added => QTY: %s, Price: %s, New current: %s", quantity, price, self.current_inventory
+            )
 
     def sell_inventory(self, quantity_to_sell, sell_price):
         """
-        Sell 'quantity_to_sell' units from the inventory using LIFO.
+        Sell 'quantity_to_sell' units from the inventory using its cost-basis method.
         'sell_price' is the price at which we sold it (revenue side).
         Returns: (cogs, loss)
         """
-        cogs = 0
-        remaining_quantity = quantity_to_sell
         loss = 0  # Track loss if selling below cost
 
-        logger.debug(f"[sell_inventory] Starting LIFO sale => Sell: {quantity_to_sell}, Price: {sell_price}")
-
-        while remaining_quantity > 0 and self.inventory:
-            recent_batch = self.inventory.pop()  # LIFO
-            batch_quantity = recent_batch["quantity"]
-            batch_price = recent_batch["price"]
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "[sell_inventory] Starting %s sale => Sell: %s, Price: %s",
+                self.method.upper(), quantity_to_sell, sell_price,
+            )
 
-            if batch_quantity <= remaining_quantity:
-                # Sell the entire batch
-                cogs += batch_quantity * batch_price
-                remaining_quantity -= batch_quantity
-                self.current_inventory -= batch_quantity
-                logger.debug(
-                    f"[sell_inventory] Selling entire batch => "
-                    f"BatchQty: {batch_quantity}, BatchPrice: {batch_price}, "
-                    f"RemainingQtyToSell: {remaining_quantity}, Updated current_inventory: {self.current_inventory}"
-                )
-            else:
-                # Only sell part of the batch
-                cogs += remaining_quantity * batch_price
-                recent_batch["quantity"] -= remaining_quantity
-                self.inventory.append(recent_batch)
-                self.current_inventory -= remaining_quantity
-                logger.debug(
-                    f"[sell_inventory] Selling partial batch => SellQty: {remaining_quantity}, "
-                    f"RemainingBatchQty: {recent_batch['quantity']}, Updated current_inventory: {self.current_inventory}"
-                )
-                remaining_quantity = 0
+        lots_before = len(self.inventory)
+        cogs, sold_quantity = self.inventory.take(quantity_to_sell)
+        # Like the original deque Inventory, a sale from no lots leaves the count as it was
+        if sold_quantity:
+            self.current_inventory = self.inventory.total_quantity
+        if debug:
+            logger.debug(
+                "[sell_inventory] Sold %s across %d whole batch(es) => "
+                "COGS: %s, Remaining batches: %d, Updated current_inventory: %s",
+                sold_quantity, lots_before - len(self.inventory), cogs, len(self.inventory), self.current_inventory,
+            )
 
         # Calculate potential loss (if total revenue < COGS)
         total_revenue_from_sale = quantity_to_sell * sell_price
         if total_revenue_from_sale < cogs:
             loss = cogs - total_revenue_from_sale
-            logger.debug(
-                f"[sell_inventory] Sale resulted in a loss => "
-                f"COGS: {cogs}, Revenue: {total_revenue_from_sale}, Loss: {loss}"
-            )
+            if debug:
+                logger.debug(
+                    "[sell_inventory] Sale resulted in a loss => COGS: %s, Revenue: %s, Loss: %s",
+                    cogs, total_revenue_from_sale, loss,
+                )
 
         return cogs, loss
 
-def main():
+REPORT_FIELDS = [
+    "timestamp", "beginning_inventory", "received", "sold_quantity",
+    "daily_revenue", "daily_cogs", "gross_profit", "total_loss",
+    "net_inventory_movement", "ending_inventory", "gross_margin_percentage"
+]
+
+# Report columns that add up across wallets in the consolidated report
+_SUMMED_FIELDS = REPORT_FIELDS[1:-1]
+
+# Columns totalled per method in cost_basis_comparison.csv
+_COMPARED_FIELDS = ["daily_revenue", "daily_cogs", "gross_profit", "total_loss"]
+
+
+class LedgerFormat:
     """
-    Main function to read a CSV file (data_total_final2.csv),
-    process inventory in LIFO order, and produce a daily report (daily_report.csv).
+    Column names, parsing and output formatting for one input mode.
+    Files written by read_all_new in exact mode carry integer rao / micro-USD columns.
     """
-    logger.info("[main] Starting LIFO read script...")
 
-    inventory = Inventory()
-    daily_report = []
+    def __init__(self, exact):
+        self.exact = exact
+        if exact:
+            self.received_col, self.sold_col, self.price_col = "received_rao", "sold_rao", "price_micro_usd"
+            self.parse, self.zero = int, 0
+            self.fmt_qty, self.fmt_usd, self.fmt_price = format_tao, format_usd, format_price
+            self.fmt_margin, self.no_margin = format_percentage, "0.00"
+        else:
+            self.received_col, self.sold_col, self.price_col = "received", "sold", "price"
+            self.parse, self.zero = float, 0.0
+            self.fmt_qty, self.fmt_usd, self.fmt_price = (lambda v: round(v, 6)), (lambda v: round(v, 2)), float
+            self.fmt_margin, self.no_margin = (lambda profit, revenue: round((profit / revenue) * 100, 2)), 0
+
+    @property
+    def report_types(self):
+        """Column types of the report for the columnar formats; exact values stay decimal strings."""
+        if self.exact:
+            return None
+        return {field: "str" if field == "timestamp" else "float" for field in REPORT_FIELDS}
+
+    @classmethod
+    def detect(cls, fieldnames):
+        return cls("received_rao" in (fieldnames or []))
+
+    def format_row(self, day):
+        """Format one raw day (see process_rows) as a daily_report.csv row."""
+        gross_margin_percentage = self.no_margin
+        if day["sold_quantity"] > 0 and day["daily_revenue"] > 0:
+            gross_margin_percentage = self.fmt_margin(day["gross_profit"], day["daily_revenue"])
+        return {
+            "timestamp": day["timestamp"],
+            "beginning_inventory": self.fmt_qty(day["beginning_inventory"]),
+            "received": self.fmt_qty(day["received"]),
+            "sold_quantity": self.fmt_qty(day["sold_quantity"]),
+            "daily_revenue": self.fmt_usd(day["daily_revenue"]),
+            "daily_cogs": self.fmt_usd(day["daily_cogs"]),
+            "gross_profit": self.fmt_usd(day["gross_profit"]),
+            "total_loss": self.fmt_usd(day["total_loss"]),
+            "net_inventory_movement": self.fmt_qty(day["net_inventory_movement"]),
+            "ending_inventory": self.fmt_qty(day["ending_inventory"]),
+            "gross_margin_percentage": gross_margin_percentage,
+        }
 
-    csv_file = "data_total_final2.csv"
-    output_file = "daily_report.csv"
 
-    # Check if data_total_final2.csv actually exists and has content
+def parse_row(row, fmt):
+    """Return (date, received, sold, price) for one input row."""
+    date = row["timestamp"].split("T")[0] if row["timestamp"] else "N/A"
+    received = fmt.parse(row[fmt.received_col]) if row[fmt.received_col] else fmt.zero
+    sold = fmt.parse(row[fmt.sold_col]) if row[fmt.sold_col] else fmt.zero
+    price = fmt.parse(row[fmt.price_col]) if row[fmt.price_col] else fmt.zero
+    return date, received, sold, price
+
+
+def apply_day(inventory, date, received, sold, price):
+    """
+    Book one day's movements on 'inventory' and return the raw (unformatted) report day.
+    Besides the daily report columns it carries the day's price and the cost basis of
+    the inventory before and after the day, for the period rollups (see reports.py).
+    """
+    beginning_inventory = inventory.current_inventory
+    beginning_cost_basis = inventory.inventory.total_cost
+    daily_revenue = 0
+    daily_cogs = 0
+    daily_profit_loss = 0
+    loss = 0
+
+    # If we received some quantity, treat it as an "inventory purchase" at that price
+    #
+    # NOTE: This is conceptually reversed if you consider "received" as a new supply
+    #       rather than revenue from a sale. But we leave the logic as-is.
+    if received > 0:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[main] Date %s: Received=%s at Price=%s", date, received, price)
+        revenue = received * price
+        daily_revenue += revenue
+        inventory.add_inventory(received, price, date)
+
+    # If we sold some quantity, compute COGS with the inventory's method (LIFO by default)
+    if sold > 0:
+        cogs, loss = inventory.sell_inventory(sold, price)
+        daily_cogs += cogs
+
+        # daily_revenue so far includes "revenue" from 'received'
+        # per the original code. This is unorthodox but kept unchanged.
+        daily_profit_loss = daily_revenue - daily_cogs - loss
+
+    return {
+        "timestamp": date,
+        "beginning_inventory": beginning_inventory,
+        "received": received,
+        "sold_quantity": sold,
+        "daily_revenue": daily_revenue,
+        "daily_cogs": daily_cogs,
+        "gross_profit": daily_profit_loss,
+        "total_loss": loss,
+        "net_inventory_movement": received - sold,
+        "ending_inventory": inventory.current_inventory,
+        "price": price,
+        "sales_proceeds": sold * price,
+        "beginning_cost_basis": beginning_cost_basis,
+        "cost_basis": inventory.inventory.total_cost,
+    }
+
+
+def process_rows(rows, inventory, fmt, start=0):
+    """
+    Run input rows through 'inventory' and yield one raw (unformatted) report day per row.
+    'start' is the number of input rows already processed before these.
+    """
+    level, every = row_logging(logger)
+    for rows_read, row in enumerate(rows, start=start + 1):
+        if every and rows_read % every == 0:
+            logger.log(level, "[main] Row %d => %s", rows_read, row)
+        yield apply_day(inventory, *parse_row(row, fmt))
+
+
+def _event_day(day, inventory, beginning_inventory, beginning_cost_basis,
+               received, sold, revenue, cogs, loss, proceeds, price):
+    return {
+        "timestamp": unix_to_date(day * 86400),
+        "beginning_inventory": beginning_inventory,
+        "received": received,
+        "sold_quantity": sold,
+        "daily_revenue": revenue,
+        "daily_cogs": cogs,
+        # Like apply_day: only days with a sale have a gross profit
+        "gross_profit": revenue - cogs - loss if sold > 0 else 0,
+        "total_loss": loss,
+        "net_inventory_movement": received - sold,
+        "ending_inventory": inventory.current_inventory,
+        "price": price,
+        "sales_proceeds": proceeds,
+        "beginning_cost_basis": beginning_cost_basis,
+        "cost_basis": inventory.inventory.total_cost,
+    }
+
+
+def replay_events(events, price_at, inventory, zero):
+    """
+    Book time-ordered (timestamp, wallet_index, kind, quantity) events (see events.py)
+    on 'inventory' one by one, each at price_at(timestamp), and yield one raw report
+    day (as apply_day's) per UTC day that has events. Revenue and COGS are summed over
+    the day's events, the day's price is the last one used that day.
+    """
+    level, every = row_logging(logger)
+    add_lot, sell = inventory.add_lot, inventory.sell_inventory
+    day = None
+    events_read = 0
+    for events_read, (timestamp, wallet_index, kind, quantity) in enumerate(events, start=1):
+        if every and events_read % every == 0:
+            logger.log(level, "[events] Event %d => %s %s %s", events_read, timestamp, kind, quantity)
+        if timestamp // 86400 != day:
+            if day is not None:
+                yield _event_day(day, inventory, beginning_inventory, beginning_cost_basis,
+                                 received, sold, revenue, cogs, loss, proceeds, price)
+            day = timestamp // 86400
+            beginning_inventory = inventory.current_inventory
+            beginning_cost_basis = inventory.inventory.total_cost
+            received = sold = revenue = cogs = loss = proceeds = zero
+
+        price = price_at(timestamp)
+        if kind == ACQUISITION:
+            add_lot(quantity, price, timestamp, wallet_index)
+            received += quantity
+            revenue += quantity * price
+        else:
+            sale_cogs, sale_loss = sell(quantity, price)
+            sold += quantity
+            cogs += sale_cogs
+            loss += sale_loss
+            proceeds += quantity * price
+
+    if day is not None:
+        yield _event_day(day, inventory, beginning_inventory, beginning_cost_basis,
+                         received, sold, revenue, cogs, loss, proceeds, price)
+    metrics.count("events_replayed", events_read)
+
+
+def count_days(days):
+    """Add replayed raw report days to the row, lot and sale counters (see metrics.py)."""
+    metrics.count("rows_replayed", len(days))
+    metrics.count("lots_added", sum(1 for day in days if day["received"] > 0))
+    metrics.count("sales", sum(1 for day in days if day["sold_quantity"] > 0))
+
+
+def write_report(output_file, days, fmt):
+    """Write raw report days to 'output_file' in the daily_report layout (format by extension)."""
+    try:
+        with metrics.stage("report_write"), TableWriter(output_file, REPORT_FIELDS, fmt.report_types) as writer:
+            writer.writerows(fmt.format_row(day) for day in days)
+
+        logger.info(f"[main] Daily report successfully written to {output_file}")
+    except Exception as e:
+        logger.error(f"[main] Error writing daily report: {e}")
+
+
+def _restore(inventory, saved):
+    """Put the state stored in checkpoint 'saved' into 'inventory'."""
+    inventory.inventory = saved.load_lots()
+    # An inventory that never saw a row still reports the initial integer 0
+    if len(inventory.inventory) or saved.touched:
+        inventory.current_inventory = inventory.inventory.total_quantity
+    else:
+        inventory.current_inventory = 0
+
+
+def _checkpoint(checkpoint_dir, inventory, day, rows, report, digest):
+    report.flush()
+    save_checkpoint(
+        checkpoint_dir, inventory.inventory, isinstance(inventory.current_inventory, float),
+        day["timestamp"], rows, report.tell(), digest.digest(),
+    )
+
+
+def _input_exists(csv_file):
+    # Check if the input actually exists and has content
     if not os.path.exists(csv_file):
         logger.error(f"[main] {csv_file} not found. Exiting.")
-        return
-    else:
-        file_size = os.path.getsize(csv_file)
-        logger.debug(f"[main] {csv_file} found. Size: {file_size} bytes")
+        return False
+    file_size = os.path.getsize(csv_file)
+    logger.debug(f"[main] {csv_file} found. Size: {file_size} bytes")
+    return True
+
+
+def _new_inventory(fmt, method, lot_journal, stack):
+    """
+    Inventory for a replay from the first row; with 'lot_journal', on a new journal at
+    that path (date ranges, rollups and events always rebuild it, see _run_journaled).
+    """
+    if not lot_journal:
+        return Inventory(exact=fmt.exact, method=method)
+    if not fmt.exact:
+        raise ValueError("The lot journal needs an exact-mode input (read_all_new EXACT_MODE)")
+    journal = stack.enter_context(LotJournal(lot_journal, reset=True))
+    logger.info(f"[main] Keeping the lots in the journal {lot_journal}.")
+    return Inventory(exact=True, method=method, journal=journal)
+
+
+def run_ledger(csv_file, output_file, checkpoint_dir=None, method="lifo", lot_journal=None):
+    """
+    Replay one input table through its own Inventory and write its daily report.
+    Input and report may be in any format from tables.py (by extension).
+
+    With 'checkpoint_dir', the inventory state is saved every CHECKPOINT_EVERY rows and
+    at the end. The next run restores the newest checkpoint whose part of the input is
+    unchanged, replays only the rows after it and appends them to the report (cut back
+    to where that checkpoint left it). Back-dated data therefore rolls back to the last
+    checkpoint before it. Checkpoints need plain CSV input and report, and LIFO.
+
+    'method' selects the cost-basis engine. With 'lot_journal' (exact LIFO, plain CSV
+    input and report, no checkpoints) the lots are kept in a memory-mapped journal at
+    that path, see lot_journal.py. Like a checkpoint, the journal is carried on from
+    where the previous run left it while that part of the input is unchanged, and
+    rebuilt from the first row otherwise.
+
+    Returns (exact, raw report days processed in this run), or None if 'csv_file' does
+    not exist. With 'lot_journal' the days are streamed to the report and only their
+    number is returned.
+    """
+    if checkpoint_dir or lot_journal:
+        if method != "lifo":
+            raise ValueError("Checkpoints and lot journals are only supported for the LIFO method")
+        if checkpoint_dir and lot_journal:
+            raise ValueError("Checkpoints cannot be combined with a lot journal")
+        if table_format(csv_file) != "csv" or table_format(output_file) != "csv":
+            raise ValueError("Checkpoints and lot journals need a plain CSV input and report")
+        if lot_journal:
+            return _run_journaled(csv_file, output_file, lot_journal)
+        return _run_checkpointed(csv_file, output_file, checkpoint_dir)
+
+    if not _input_exists(csv_file):
+        return None
+
+    fieldnames, rows = read_table(csv_file)
+    fmt = LedgerFormat.detect(fieldnames)
+    if fmt.exact:
+        logger.info("[main] Exact mode: integer rao quantities and micro-USD prices.")
+
+    with metrics.stage("lifo_replay"):
+        days = list(process_rows(rows, Inventory(exact=fmt.exact, method=method), fmt))
+    count_days(days)
+    logger.info(f"[main] Finished reading {csv_file}: {len(days)} rows processed.")
+
+    write_report(output_file, days, fmt)
+    return fmt.exact, days
 
+
+def _run_checkpointed(csv_file, output_file, checkpoint_dir):
+    """run_ledger with checkpoints (plain CSV, LIFO)."""
+    if not _input_exists(csv_file):
+        return None
+
+    digest = new_digest()
+    days = []
     with open(csv_file, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        rows_read = 0
+        reader = csv.DictReader(hashed_lines(csvfile, digest))
+        fmt = LedgerFormat.detect(reader.fieldnames)
+        if fmt.exact:
+            logger.info("[main] Exact mode: integer rao quantities and micro-USD prices.")
+
+        inventory = Inventory(exact=fmt.exact)
+        report_size = os.path.getsize(output_file) if os.path.exists(output_file) else -1
+        usable = [
+            c for c in list_checkpoints(checkpoint_dir)
+            if c.exact == fmt.exact and c.report_offset <= report_size
+        ]
+        resumed, rows = fast_forward(reader, digest, usable)
+        discard_after(checkpoint_dir, resumed.rows if resumed else 0)
+
+        start = 0
+        if resumed:
+            start = resumed.rows
+            _restore(inventory, resumed)
+            logger.info(f"[main] Resuming after {resumed.last_date} ({start} rows from checkpoint).")
+
+        try:
+            # Rows are written as they are replayed, so this stage includes the report
+            with metrics.stage("lifo_replay"), open(output_file, mode="r+" if resumed else "w", newline="") as report:
+                writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+                if resumed:
+                    report.seek(resumed.report_offset)
+                    report.truncate()
+                else:
+                    writer.writeheader()
+
+                rows_read = start
+                for day in process_rows(rows, inventory, fmt, start=start):
+                    writer.writerow(fmt.format_row(day))
+                    days.append(day)
+                    rows_read += 1
+                    if rows_read % CHECKPOINT_EVERY == 0:
+                        _checkpoint(checkpoint_dir, inventory, day, rows_read, report, digest)
+
+                if days and rows_read % CHECKPOINT_EVERY:
+                    _checkpoint(checkpoint_dir, inventory, days[-1], rows_read, report, digest)
+
+            logger.info(f"[main] Daily report successfully written to {output_file}")
+        except Exception as e:
+            logger.error(f"[main] Error writing daily report: {e}")
+
+        count_days(days)
+        logger.info(f"[main] Finished reading {csv_file}: {len(days)} rows processed.")
+
+    return fmt.exact, days
+
+
+def _run_journaled(csv_file, output_file, lot_journal):
+    """run_ledger on a lot journal (exact mode, plain CSV, LIFO)."""
+    if not _input_exists(csv_file):
+        return None
+
+    digest = new_digest()
+    with open(csv_file, newline='') as csvfile, LotJournal(lot_journal) as journal:
+        reader = csv.DictReader(hashed_lines(csvfile, digest))
+        fmt = LedgerFormat.detect(reader.fieldnames)
+        if not fmt.exact:
+            raise ValueError("The lot journal needs an exact-mode input (read_all_new EXACT_MODE)")
+        logger.info("[main] Exact mode: integer rao quantities and micro-USD prices.")
+
+        # The journal is usable while the input still starts with the lines it was built from
+        report_size = os.path.getsize(output_file) if os.path.exists(output_file) else -1
+        usable = [journal] if journal.rows and journal.report_offset <= report_size else []
+        resumed, rows = fast_forward(reader, digest, usable)
+        start = journal.rows if resumed else 0
+        if resumed:
+            logger.info(f"[main] Resuming the journal {lot_journal} after {journal.last_date} ({start} rows).")
+        else:
+            logger.info(f"[main] Rebuilding the journal {lot_journal} from the first row.")
+            journal.reset()
+        report_offset, last_date = journal.report_offset, journal.last_date
+        # Until this run is done the lots match no input prefix
+        journal.mark(0, "", 0, b"")
+        inventory = Inventory(exact=True, journal=journal)
+
+        rows_read, lots_added, sales = start, 0, 0
+        try:
+            with metrics.stage("lifo_replay"), open(output_file, mode="r+" if resumed else "w", newline="") as report:
+                writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+                if resumed:
+                    report.seek(report_offset)
+                    report.truncate()
+                else:
+                    writer.writeheader()
+
+                for day in process_rows(rows, inventory, fmt, start=start):
+                    writer.writerow(fmt.format_row(day))
+                    rows_read += 1
+                    lots_added += day["received"] > 0
+                    sales += day["sold_quantity"] > 0
+                    last_date = day["timestamp"]
+
+                report.flush()
+                journal.mark(rows_read, last_date, report.tell(), digest.digest())
+            logger.info(f"[main] Daily report successfully written to {output_file}")
+        except Exception as e:
+            logger.error(f"[main] Error writing daily report: {e}")
+
+    metrics.count("rows_replayed", rows_read - start)
+    metrics.count("lots_added", lots_added)
+    metrics.count("sales", sales)
+    logger.info(f"[main] Finished reading {csv_file}: {rows_read - start} rows processed.")
+    return True, rows_read - start
+
+
+def in_date_range(days, date_from=None, date_to=None):
+    """
+    Raw report days (in date order) within [date_from, date_to], "YYYY-MM-DD" strings
+    or None. Days before 'date_from' are still consumed, so the inventory carries their
+    lots forward; nothing after 'date_to' is read.
+    """
+    for day in days:
+        if date_to is not None and day["timestamp"] > date_to:
+            return
+        if date_from is None or day["timestamp"] >= date_from:
+            yield day
+
+
+def run_report(csv_file, output_file, method="lifo", periods=(), date_from=None, date_to=None,
+               checkpoint_dir=None, rollup_prefix="report", report_format="csv", lot_journal=None):
+    """
+    Replay 'csv_file' and write the daily report for [date_from, date_to] plus the
+    'periods' rollups ('{rollup_prefix}_{period}', see reports.py) in the same pass.
+
+    Rows before 'date_from' are booked but not reported, so the cost basis in range is
+    the carried-forward one. With 'checkpoint_dir' (LIFO, plain CSV input) those rows
+    are skipped instead: the newest checkpoint taken before 'date_from' whose part of
+    the input is unchanged is restored. Checkpoints are only read here. Otherwise
+    'lot_journal' keeps the lots in a journal file, as in run_ledger.
+
+    Returns (exact, raw report days in range), or None if 'csv_file' does not exist.
+    """
+    if not _input_exists(csv_file):
+        return None
+
+    with ExitStack() as stack:
+        start = 0
+        if checkpoint_dir and date_from:
+            if method != "lifo" or table_format(csv_file) != "csv":
+                raise ValueError("Checkpoints need the LIFO method and a plain CSV input")
+            if lot_journal:
+                raise ValueError("Checkpoints cannot be combined with a lot journal")
+            digest = new_digest()
+            reader = csv.DictReader(hashed_lines(stack.enter_context(open(csv_file, newline="")), digest))
+            fmt = LedgerFormat.detect(reader.fieldnames)
+            inventory = Inventory(exact=fmt.exact)
+            usable = [c for c in list_checkpoints(checkpoint_dir) if c.exact == fmt.exact and c.last_date < date_from]
+            resumed, rows = fast_forward(reader, digest, usable)
+            if resumed:
+                start = resumed.rows
+                _restore(inventory, resumed)
+                logger.info(f"[main] Starting from the checkpoint after {resumed.last_date} ({start} rows skipped).")
+        else:
+            fieldnames, rows = read_table(csv_file)
+            fmt = LedgerFormat.detect(fieldnames)
+            inventory = _new_inventory(fmt, method, lot_journal, stack)
+        if fmt.exact:
+            logger.info("[main] Exact mode: integer rao quantities and micro-USD prices.")
+
+        engine = ReportEngine(fmt, periods)
+        with metrics.stage("lifo_replay"):
+            days = list(engine.add_all(
+                in_date_range(process_rows(rows, inventory, fmt, start=start), date_from, date_to)
+            ))
+        count_days(days)
+        logger.info(f"[main] Finished reading {csv_file}: {len(days)} rows reported.")
+
+    write_report(output_file, days, fmt)
+    if periods:
+        engine.write(rollup_prefix, report_format)
+    return fmt.exact, days
+
+
+def run_events(events, price_at, output_file, exact=False, method="lifo", periods=(), date_from=None,
+               date_to=None, rollup_prefix="report_events", report_format="csv", lot_journal=None):
+    """
+    Event-level counterpart of run_report: book 'events' (see replay_events) and write
+    the daily report built from them, plus the 'periods' rollups, for [date_from, date_to].
+    Quantities and prices are integer rao / micro-USD when 'exact' is set.
+
+    Returns the raw report days in range.
+    """
+    fmt = LedgerFormat(exact)
+    engine = ReportEngine(fmt, periods)
+    with ExitStack() as stack, metrics.stage("lifo_replay"):
+        inventory = _new_inventory(fmt, method, lot_journal, stack)
+        days = list(engine.add_all(
+            in_date_range(replay_events(events, price_at, inventory, fmt.zero), date_from, date_to)
+        ))
+    count_days(days)
+    logger.info(f"[main] Finished replaying events: {len(days)} day(s) reported.")
+
+    write_report(output_file, days, fmt)
+    if periods:
+        engine.write(rollup_prefix, report_format)
+    return days
+
+
+def run_methods(csv_file, methods, report_format="csv"):
+    """
+    Compare cost-basis methods in one pass: every input row is parsed once and booked
+    on one Inventory per method. Writes daily_report_{method} for each method (in
+    'report_format') and cost_basis_comparison.csv with the totals side by side.
+    """
+    if not _input_exists(csv_file):
+        return None
+
+    fieldnames, reader = read_table(csv_file)
+    fmt = LedgerFormat.detect(fieldnames)
+    with ExitStack() as outputs:
+        outputs.enter_context(metrics.stage("lifo_replay"))
+        inventories = {method: Inventory(exact=fmt.exact, method=method) for method in methods}
+        totals = {method: dict.fromkeys(_COMPARED_FIELDS, 0) for method in methods}
 
+        writers = {
+            method: outputs.enter_context(TableWriter(
+                with_format(f"daily_report_{method}.csv", report_format), REPORT_FIELDS, fmt.report_types
+            ))
+            for method in methods
+        }
+
+        level, every = row_logging(logger)
+        rows_read = 0
         for row in reader:
             rows_read += 1
-            logger.debug(f"[main] Row {rows_read} => {row}")
+            if every and rows_read % every == 0:
+                logger.log(level, "[main] Row %d => %s", rows_read, row)
+            parsed = parse_row(row, fmt)
+            for method, inventory in inventories.items():
+                day = apply_day(inventory, *parsed)
+                writers[method].writerow(fmt.format_row(day))
+                method_totals = totals[method]
+                for field in _COMPARED_FIELDS:
+                    method_totals[field] += day[field]
 
-            date = row["timestamp"].split("T")[0] if row["timestamp"] else "N/A"
-            received = float(row["received"]) if row["received"] else 0.0
-            sold = float(row["sold"]) if row["sold"] else 0.0
-            price = float(row["price"]) if row["price"] else 0.0
+        metrics.count("rows_replayed", rows_read)
+        logger.info(f"[main] Finished reading {csv_file}: {rows_read} rows, {len(methods)} method(s).")
 
-            beginning_inventory = inventory.current_inventory
-            daily_revenue = 0
-            daily_cogs = 0
-            daily_profit_loss = 0
-            gross_margin_percentage = 0
-            loss = 0
-
-            # If we received some quantity, treat it as an "inventory purchase" at that price
-            #
-            # NOTE: This is conceptually reversed if you consider "received" as a new supply
-            #       rather than revenue from a sale. But we leave the logic as-is.
-            if received > 0:
-                logger.debug(f"[main] Date {date}: Received={received} at Price={price}")
-                revenue = received * price
-                daily_revenue += revenue
-                inventory.add_inventory(received, price)
-
-            # If we sold some quantity, compute COGS via LIFO
-            if sold > 0:
-                cogs, loss = inventory.sell_inventory(sold, price)
-                daily_cogs += cogs
-
-                # daily_revenue so far includes "revenue" from 'received'
-                # per the original code. This is unorthodox but kept unchanged.
-                daily_profit_loss = daily_revenue - daily_cogs - loss
-
-                if daily_revenue > 0:
-                    gross_margin_percentage = (daily_profit_loss / daily_revenue) * 100
-
-            ending_inventory = inventory.current_inventory
-            net_inventory_movement = received - sold
-
-            daily_report.append({
-                "timestamp": date,
-                "beginning_inventory": round(beginning_inventory, 6),
-                "received": round(received, 6),
-                "sold_quantity": round(sold, 6),
-                "daily_revenue": round(daily_revenue, 2),
-                "daily_cogs": round(daily_cogs, 2),
-                "gross_profit": round(daily_profit_loss, 2),
-                "total_loss": round(loss, 2),
-                "net_inventory_movement": round(net_inventory_movement, 6),
-                "ending_inventory": round(ending_inventory, 6),
-                "gross_margin_percentage": round(gross_margin_percentage, 2)
-            })
-
-        logger.info(f"[main] Finished reading CSV: {rows_read} rows processed.")
-
-    # Write daily report
+    with open("cost_basis_comparison.csv", mode="w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["method", *_COMPARED_FIELDS, "ending_inventory"])
+        for method, method_totals in totals.items():
+            writer.writerow([
+                method,
+                *(fmt.fmt_usd(method_totals[field]) for field in _COMPARED_FIELDS),
+                fmt.fmt_qty(inventories[method].current_inventory),
+            ])
+    logger.info("[main] Cost-basis comparison written to cost_basis_comparison.csv")
+    return totals
+
+
+def consolidate(wallet_days, zero):
+    """
+    Roll per-wallet report days up into one report over every date any wallet has.
+    A wallet without a row on some date still holds its last ending inventory (and its
+    cost basis), which counts towards that date's beginning and ending inventory. Before
+    its first row, that is what it carried into the first row.
+    """
+    dates = sorted({day["timestamp"] for days in wallet_days.values() for day in days})
+    positions = {wallet: 0 for wallet in wallet_days}
+    holdings = {wallet: days[0]["beginning_inventory"] if days else zero for wallet, days in wallet_days.items()}
+    costs = {wallet: days[0]["beginning_cost_basis"] if days else zero for wallet, days in wallet_days.items()}
+
+    consolidated = []
+    for date in dates:
+        total = dict.fromkeys(_SUMMED_FIELDS, zero)
+        total["beginning_cost_basis"] = total["cost_basis"] = total["sales_proceeds"] = zero
+        for wallet, days in wallet_days.items():
+            i = positions[wallet]
+            if i < len(days) and days[i]["timestamp"] == date:
+                day = days[i]
+                positions[wallet] = i + 1
+                for field in _SUMMED_FIELDS:
+                    total[field] += day[field]
+                total["beginning_cost_basis"] += day["beginning_cost_basis"]
+                total["cost_basis"] += day["cost_basis"]
+                total["sales_proceeds"] += day["sales_proceeds"]
+                # Every wallet table carries the same daily price
+                total["price"] = day["price"]
+                holdings[wallet] = day["ending_inventory"]
+                costs[wallet] = day["cost_basis"]
+            else:
+                total["beginning_inventory"] += holdings[wallet]
+                total["ending_inventory"] += holdings[wallet]
+                total["beginning_cost_basis"] += costs[wallet]
+                total["cost_basis"] += costs[wallet]
+        total["timestamp"] = date
+        consolidated.append(total)
+    return consolidated
+
+
+def main_wallets(wallet_dir, workers=1, method="lifo", report_format="csv", wallets=None,
+                 periods=(), date_from=None, date_to=None):
+    """
+    Per-wallet LIFO books: every table in 'wallet_dir' (as written by read_all_new with
+    WALLET_CSV_DIR set) is replayed through its own Inventory, in parallel processes.
+    Writes daily_report_{wallet} per wallet plus daily_report_consolidated, in 'report_format'.
+
+    'wallets' limits the run to those wallets' tables. 'periods', 'date_from' and
+    'date_to' work as in run_report, for every wallet and for the consolidated report.
+    """
+    inputs = sorted(
+        name for name in os.listdir(wallet_dir)
+        if table_format(name) and (wallets is None or split_format(name)[0] in wallets)
+    )
+    if not inputs:
+        logger.error(f"[main] No wallet tables in {wallet_dir}. Exiting.")
+        return
+    logger.info(f"[main] Running {len(inputs)} wallet ledger(s) with {workers} worker process(es)...")
+
+    wallets = [split_format(name)[0] for name in inputs]
+    # multiprocessing is slow to import, so only load it when it is used
+    from concurrent.futures import ProcessPoolExecutor
+
+    # The ledgers' own stages and counters stay in the worker processes; this times them all
+    with metrics.stage("wallet_ledgers"), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                run_report, os.path.join(wallet_dir, name),
+                with_format(f"daily_report_{wallet}.csv", report_format), method=method,
+                periods=periods, date_from=date_from, date_to=date_to,
+                rollup_prefix=f"report_{wallet}", report_format=report_format,
+            )
+            for wallet, name in zip(wallets, inputs)
+        ]
+        results = {wallet: future.result() for wallet, future in zip(wallets, futures)}
+
+    modes = {exact for exact, _ in results.values()}
+    if len(modes) > 1:
+        logger.error("[main] Wallet CSVs mix exact and float mode; not writing a consolidated report.")
+        return
+    fmt = LedgerFormat(modes.pop())
+
+    with metrics.stage("consolidate"):
+        consolidated = consolidate({wallet: days for wallet, (_, days) in results.items()}, fmt.zero)
+    for _, days in results.values():
+        count_days(days)
+    write_report(with_format("daily_report_consolidated.csv", report_format), consolidated, fmt)
+    if periods:
+        engine = ReportEngine(fmt, periods)
+        for day in consolidated:
+            engine.add(day)
+        engine.write("report_consolidated", report_format)
+
+
+def main(checkpoint_dir=None, methods=("lifo",), input_file="data_total_final2.csv", report_format="csv",
+         periods=(), date_from=None, date_to=None, lot_journal=None):
+    """
+    Main function to read a CSV file (data_total_final2.csv),
+    process inventory in LIFO order, and produce a daily report (daily_report.csv).
+    With several 'methods', compare them in one pass instead (see run_methods).
+    With 'periods' or a date range, also write period rollups (see run_report).
+    With 'lot_journal', the lots are kept in a memory-mapped journal file.
+    """
+    logger.info("[main] Starting LIFO read script...")
+    if len(methods) > 1:
+        run_methods(input_file, methods, report_format=report_format)
+    elif periods or date_from or date_to:
+        run_report(
+            input_file, with_format("daily_report.csv", report_format), method=methods[0],
+            periods=periods, date_from=date_from, date_to=date_to,
+            checkpoint_dir=checkpoint_dir, report_format=report_format, lot_journal=lot_journal,
+        )
+    else:
+        run_ledger(
+            input_file, with_format("daily_report.csv", report_format),
+            checkpoint_dir=checkpoint_dir, method=methods[0], lot_journal=lot_journal,
+        )
+
+
+def _iso_date(value):
+    """argparse type for --from/--to: a YYYY-MM-DD date."""
     try:
-        with open(output_file, mode="w", newline="") as csvfile:
-            fieldnames = [
-                "timestamp", "beginning_inventory", "received", "sold_quantity",
-                "daily_revenue", "daily_cogs", "gross_profit", "total_loss",
-                "net_inventory_movement", "ending_inventory", "gross_margin_percentage"
-            ]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(daily_report)
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value!r}")
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--wallet-dir",
+        help="directory of per-wallet CSVs (read_all_new WALLET_CSV_DIR); runs one ledger per wallet",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="processes for per-wallet ledgers")
+    parser.add_argument(
+        "--checkpoint-dir",
+        help="keep inventory checkpoints here and only replay rows added since the last run",
+    )
+    parser.add_argument(
+        "--method", action="append", choices=sorted(COST_BASIS_ENGINES),
+        help="cost-basis method (default lifo); repeat to compare several in one pass",
+    )
+    parser.add_argument(
+        "--input", default="data_total_final2.csv",
+        help="input table (.csv, .csv.gz, .csv.zst, .parquet or .arrow)",
+    )
+    parser.add_argument(
+        "--report-format", choices=sorted(FORMATS), default="csv",
+        help="format of the daily reports (default csv)",
+    )
+    parser.add_argument(
+        "--period", action="append", choices=list(PERIODS),
+        help="also write period rollups (report_<period>); repeat for several",
+    )
+    parser.add_argument("--from", dest="date_from", type=_iso_date, help="first day to report (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=_iso_date, help="last day to report (YYYY-MM-DD)")
+    parser.add_argument(
+        "--wallet", action="append",
+        help="with --wallet-dir, only run this wallet's ledger; repeat for several",
+    )
+    parser.add_argument(
+        "--lot-journal",
+        help="keep the lots in this memory-mapped journal file instead of memory (exact-mode input, LIFO)",
+    )
+
+
+def run(args, parser):
+    """Validate parsed arguments (see add_arguments) and run; also used by the bittensor-lifo CLI."""
+    methods = list(dict.fromkeys(args.method or ["lifo"]))
+    periods = list(dict.fromkeys(args.period or []))
+    reporting = periods or args.date_from or args.date_to
+
+    if args.checkpoint_dir and methods != ["lifo"]:
+        parser.error("--checkpoint-dir only supports --method lifo")
+    if args.checkpoint_dir and (table_format(args.input) != "csv" or args.report_format != "csv"):
+        parser.error("--checkpoint-dir needs a plain CSV input and report")
+    if args.wallet_dir and args.checkpoint_dir:
+        # The consolidated roll-up needs every wallet's full history
+        parser.error("--checkpoint-dir cannot be combined with --wallet-dir")
+    if args.wallet_dir and len(methods) > 1:
+        parser.error("--wallet-dir runs one --method at a time")
+    if reporting and len(methods) > 1:
+        parser.error("--period, --from and --to run one --method at a time")
+    if args.date_from and args.date_to and args.date_from > args.date_to:
+        parser.error("--from is after --to")
+    if args.wallet and not args.wallet_dir:
+        parser.error("--wallet needs --wallet-dir")
+    if args.lot_journal and (methods != ["lifo"] or args.checkpoint_dir or args.wallet_dir):
+        parser.error("--lot-journal only supports --method lifo, without --checkpoint-dir or --wallet-dir")
+    if args.lot_journal and not reporting and (table_format(args.input) != "csv" or args.report_format != "csv"):
+        parser.error("--lot-journal needs a plain CSV input and report")
+
+    try:
+        if args.wallet_dir:
+            main_wallets(
+                args.wallet_dir, workers=args.workers, method=methods[0], report_format=args.report_format,
+                wallets=args.wallet, periods=periods, date_from=args.date_from, date_to=args.date_to,
+            )
+        else:
+            main(
+                checkpoint_dir=args.checkpoint_dir, methods=methods,
+                input_file=args.input, report_format=args.report_format,
+                periods=periods, date_from=args.date_from, date_to=args.date_to, lot_journal=args.lot_journal,
+            )
+    finally:
+        metrics.export(args, "read_lifo")
 
-        logger.info(f"[main] Daily report successfully written to {output_file}")
-    except Exception as e:
-        logger.error(f"[main] Error writing daily report: {e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="LIFO inventory report from data_total_final2.csv.")
+    add_arguments(parser)
+    add_logging_arguments(parser)
+    metrics.add_metrics_arguments(parser)
+    args = parser.parse_args()
+    configure_logging(args.log_level, args.trace_every)
+    metrics.configure(args.profile_stage, args.profiler)
+    run(args, parser)
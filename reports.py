@@ -0,0 +1,131 @@
+"""
+Period rollups of the LIFO ledger: monthly, quarterly and yearly totals built from
+the raw report days (see read_lifo.apply_day) while the daily report is written, so
+the input is only read once.
+
+Each period row has the realized side (revenue, COGS, gross profit, loss, sales
+proceeds and realized gain) summed over its days, and the inventory at the period's
+last day valued at that day's price: cost basis, market value and unrealized gain.
+"""
+import logging
+
+from tables import TableWriter, with_format
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = [
+    "period", "start", "end", "days", "beginning_inventory", "received", "sold_quantity",
+    "daily_revenue", "daily_cogs", "gross_profit", "total_loss", "sales_proceeds", "realized_gain",
+    "ending_inventory", "cost_basis", "period_end_price", "market_value", "unrealized_gain",
+]
+
+_QTY_FIELDS = ("beginning_inventory", "received", "sold_quantity", "ending_inventory")
+_USD_FIELDS = (
+    "daily_revenue", "daily_cogs", "gross_profit", "total_loss", "sales_proceeds", "realized_gain",
+    "cost_basis", "market_value", "unrealized_gain",
+)
+
+
+def _month(date):
+    return date[:7]
+
+
+def _quarter(date):
+    return f"{date[:4]}-Q{(int(date[5:7]) + 2) // 3}"
+
+
+def _year(date):
+    return date[:4]
+
+
+# Period name -> key of a "YYYY-MM-DD" date
+PERIODS = {"month": _month, "quarter": _quarter, "year": _year}
+
+
+class Rollup:
+    """Totals of consecutive raw report days per period of one kind."""
+
+    def __init__(self, period, zero):
+        self.period = period
+        self._key = PERIODS[period]
+        self._zero = zero
+        self._current = None
+        self.rows = []
+
+    def add(self, day):
+        key = self._key(day["timestamp"])
+        current = self._current
+        if current is None or current["period"] != key:
+            current = self._current = {
+                "period": key,
+                "start": day["timestamp"],
+                "days": 0,
+                "beginning_inventory": day["beginning_inventory"],
+                **dict.fromkeys(("received", "sold_quantity", "daily_revenue", "daily_cogs",
+                                 "gross_profit", "total_loss", "sales_proceeds"), self._zero),
+            }
+            self.rows.append(current)
+        current["days"] += 1
+        current["received"] += day["received"]
+        current["sold_quantity"] += day["sold_quantity"]
+        current["daily_revenue"] += day["daily_revenue"]
+        current["daily_cogs"] += day["daily_cogs"]
+        current["gross_profit"] += day["gross_profit"]
+        current["total_loss"] += day["total_loss"]
+        current["sales_proceeds"] += day["sales_proceeds"]
+        # The period's end state is simply that of its latest day
+        current["end"] = day["timestamp"]
+        current["ending_inventory"] = day["ending_inventory"]
+        current["cost_basis"] = day["cost_basis"]
+        current["period_end_price"] = day["price"]
+
+
+class ReportEngine:
+    """
+    Rollups for several period kinds at once. Feed it raw report days in date order
+    with add(); write() then writes one table per period kind.
+    """
+
+    def __init__(self, fmt, periods):
+        self.fmt = fmt
+        self.rollups = [Rollup(period, fmt.zero) for period in periods]
+
+    def add(self, day):
+        for rollup in self.rollups:
+            rollup.add(day)
+
+    def add_all(self, days):
+        """Pass 'days' through, adding each one on the way."""
+        for day in days:
+            self.add(day)
+            yield day
+
+    def format_row(self, row):
+        fmt = self.fmt
+        sales_proceeds = row["sales_proceeds"]
+        market_value = row["ending_inventory"] * row["period_end_price"]
+        values = {
+            **row,
+            "realized_gain": sales_proceeds - row["daily_cogs"],
+            "market_value": market_value,
+            "unrealized_gain": market_value - row["cost_basis"],
+        }
+        formatted = {field: values[field] for field in ("period", "start", "end", "days")}
+        for field in _QTY_FIELDS:
+            formatted[field] = fmt.fmt_qty(values[field])
+        for field in _USD_FIELDS:
+            formatted[field] = fmt.fmt_usd(values[field])
+        formatted["period_end_price"] = fmt.fmt_price(values["period_end_price"])
+        return formatted
+
+    def write(self, prefix, report_format="csv"):
+        """Write '{prefix}_{period}' tables (e.g. report_quarter.csv) in 'report_format'."""
+        types = None
+        if not self.fmt.exact:
+            types = {field: "float" for field in ROLLUP_FIELDS}
+            types.update(period="str", start="str", end="str", days="int")
+        for rollup in self.rollups:
+            path = with_format(f"{prefix}_{rollup.period}.csv", report_format)
+            with TableWriter(path, ROLLUP_FIELDS, types) as writer:
+                writer.writerows(self.format_row(row) for row in rollup.rows)
+            logger.info(f"[main] {len(rollup.rows)} {rollup.period} rollup(s) written to {path}")
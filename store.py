@@ -0,0 +1,341 @@
+import heapq
+import logging
+import sqlite3
+from itertools import groupby
+from operator import itemgetter
+
+from dates import key_to_day
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    wallet          TEXT    NOT NULL,
+    day             TEXT    NOT NULL,
+    block_number    INTEGER,
+    timestamp       TEXT,
+    balance_free    INTEGER,
+    balance_staked  INTEGER,
+    balance_total   INTEGER,
+    PRIMARY KEY (wallet, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS transfers (
+    transfer_id       TEXT    PRIMARY KEY,
+    block_number      INTEGER,
+    timestamp         TEXT,
+    day               TEXT    NOT NULL,
+    from_ss58         TEXT,
+    to_ss58           TEXT,
+    amount            INTEGER NOT NULL,
+    fee               INTEGER,
+    extrinsic_id      TEXT,
+    transaction_hash  TEXT
+);
+CREATE INDEX IF NOT EXISTS transfers_from_day ON transfers (from_ss58, day);
+CREATE INDEX IF NOT EXISTS transfers_to_day ON transfers (to_ss58, day);
+
+CREATE TABLE IF NOT EXISTS prices (
+    source     TEXT    NOT NULL,
+    symbol     TEXT    NOT NULL,
+    interval   TEXT    NOT NULL,
+    open_time  INTEGER NOT NULL,
+    open       REAL,
+    high       REAL,
+    low        REAL,
+    close      REAL,
+    volume     REAL,
+    PRIMARY KEY (source, symbol, interval, open_time)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS price_coverage (
+    source    TEXT    NOT NULL,
+    symbol    TEXT    NOT NULL,
+    interval  TEXT    NOT NULL,
+    start_ms  INTEGER NOT NULL,
+    end_ms    INTEGER NOT NULL,
+    PRIMARY KEY (source, symbol, interval, start_ms)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS block_timestamps (
+    block_number  INTEGER PRIMARY KEY,
+    timestamp     TEXT    NOT NULL,
+    exact         INTEGER NOT NULL DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    wallet        TEXT NOT NULL,
+    stream        TEXT NOT NULL,
+    block_number  INTEGER,
+    timestamp     TEXT,
+    PRIMARY KEY (wallet, stream)
+) WITHOUT ROWID;
+"""
+
+
+def _int_or_none(value):
+    return int(value) if value is not None else None
+
+
+def transfer_key(row):
+    """Identity of a transfer row (extrinsic/event id), used to de-duplicate transfers."""
+    key = row.get("id") or row.get("extrinsic_id")
+    if key:
+        return str(key)
+    return f"{row.get('block_number')}:{row.get('transaction_hash')}"
+
+
+class HistoryStore:
+    """
+    Local SQLite store for balance snapshots, transfers, prices (plus which ranges
+    of each price series were fetched), block timestamps and sync cursors.
+
+    Transfers are stored once, keyed by extrinsic id, no matter how many of our wallets
+    they were fetched for: a wallet's outbound transfers are the rows with from_ss58 = wallet
+    and its inbound transfers the rows with to_ss58 = wallet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------------------------
+    # Writes
+    # ---------------------------
+
+    def save_balances(self, wallet, rows):
+        """
+        Bulk upsert balance snapshots. Rows must carry a 'day' key.
+        When a day already has a snapshot, the one with the highest block wins.
+        """
+        self.conn.executemany(
+            """
+            INSERT INTO balances (wallet, day, block_number, timestamp, balance_free, balance_staked, balance_total)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (wallet, day) DO UPDATE SET
+                block_number = excluded.block_number,
+                timestamp = excluded.timestamp,
+                balance_free = excluded.balance_free,
+                balance_staked = excluded.balance_staked,
+                balance_total = excluded.balance_total
+            WHERE excluded.block_number >= balances.block_number OR balances.block_number IS NULL
+            """,
+            (
+                (
+                    wallet, row["day"], _int_or_none(row.get("block_number")), row.get("timestamp"),
+                    _int_or_none(row.get("balance_free")), _int_or_none(row.get("balance_staked")),
+                    _int_or_none(row.get("balance_total")),
+                )
+                for row in rows
+            ),
+        )
+
+    def save_transfers(self, rows):
+        """Bulk insert transfer rows (which must carry a 'day' key); duplicates are ignored."""
+        self.conn.executemany(
+            """
+            INSERT OR IGNORE INTO transfers (
+                transfer_id, block_number, timestamp, day, from_ss58, to_ss58,
+                amount, fee, extrinsic_id, transaction_hash
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    transfer_key(row), _int_or_none(row.get("block_number")), row.get("timestamp"), row["day"],
+                    (row.get("from") or {}).get("ss58"), (row.get("to") or {}).get("ss58"),
+                    int(row["amount"]), _int_or_none(row.get("fee")),
+                    row.get("extrinsic_id"), row.get("transaction_hash"),
+                )
+                for row in rows
+            ),
+        )
+
+    def save_prices(self, source, symbol, interval, candles):
+        """Bulk upsert candles given as (open_time_ms, open, high, low, close, volume)."""
+        self.conn.executemany(
+            """
+            INSERT OR REPLACE INTO prices (source, symbol, interval, open_time, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            ((source, symbol, interval, *candle) for candle in candles),
+        )
+
+    def save_price_coverage(self, source, symbol, interval, ranges):
+        """Replace the list of fetched [start_ms, end_ms] ranges for a price series."""
+        self.conn.execute(
+            "DELETE FROM price_coverage WHERE source = ? AND symbol = ? AND interval = ?",
+            (source, symbol, interval),
+        )
+        self.conn.executemany(
+            "INSERT INTO price_coverage (source, symbol, interval, start_ms, end_ms) VALUES (?, ?, ?, ?, ?)",
+            ((source, symbol, interval, start_ms, end_ms) for start_ms, end_ms in ranges),
+        )
+
+    def save_block_timestamps(self, rows):
+        """
+        Bulk upsert (block_number, timestamp, exact) rows.
+        An interpolated timestamp (exact = 0) never replaces an exact one.
+        """
+        self.conn.executemany(
+            """
+            INSERT INTO block_timestamps (block_number, timestamp, exact) VALUES (?, ?, ?)
+            ON CONFLICT (block_number) DO UPDATE SET
+                timestamp = excluded.timestamp,
+                exact = excluded.exact
+            WHERE excluded.exact >= block_timestamps.exact
+            """,
+            rows,
+        )
+
+    def save_cursors(self, wallet, cursors):
+        """Store {stream: cursor} for 'wallet'; None cursors are skipped."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sync_cursors (wallet, stream, block_number, timestamp) VALUES (?, ?, ?, ?)",
+            (
+                (wallet, stream, cursor.get("block_number"), cursor.get("timestamp"))
+                for stream, cursor in cursors.items() if cursor
+            ),
+        )
+
+    def commit(self):
+        self.conn.commit()
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+
+    def load_cursors(self):
+        """Return {wallet: {stream: cursor}}."""
+        cursors = {}
+        for wallet, stream, block_number, timestamp in self.conn.execute(
+            "SELECT wallet, stream, block_number, timestamp FROM sync_cursors"
+        ):
+            cursors.setdefault(wallet, {})[stream] = {"block_number": block_number, "timestamp": timestamp}
+        return cursors
+
+    def load_prices(self, source, symbol, interval, start_ms=None, end_ms=None):
+        """Return candles (open_time_ms, open, high, low, close, volume) ordered by open time."""
+        sql = "SELECT open_time, open, high, low, close, volume FROM prices WHERE source = ? AND symbol = ? AND interval = ?"
+        params = [source, symbol, interval]
+        if start_ms is not None:
+            sql += " AND open_time >= ?"
+            params.append(start_ms)
+        if end_ms is not None:
+            sql += " AND open_time <= ?"
+            params.append(end_ms)
+        return self.conn.execute(sql + " ORDER BY open_time", params).fetchall()
+
+    def load_price_coverage(self, source, symbol, interval):
+        """Return the fetched [start_ms, end_ms] ranges of a price series, ordered by start."""
+        return self.conn.execute(
+            "SELECT start_ms, end_ms FROM price_coverage WHERE source = ? AND symbol = ? AND interval = ? "
+            "ORDER BY start_ms",
+            (source, symbol, interval),
+        ).fetchall()
+
+    def load_block_timestamps(self, first_block, last_block, exact_only=False):
+        """Return {block_number: timestamp} for cached blocks in [first_block, last_block]."""
+        sql = "SELECT block_number, timestamp FROM block_timestamps WHERE block_number BETWEEN ? AND ?"
+        if exact_only:
+            sql += " AND exact = 1"
+        return dict(self.conn.execute(sql, (first_block, last_block)))
+
+    def _day_range(self, start_day, end_day):
+        sql, params = "", []
+        if start_day is not None:
+            sql += " AND day >= ?"
+            params.append(start_day)
+        if end_day is not None:
+            sql += " AND day <= ?"
+            params.append(end_day)
+        return sql, params
+
+    def iter_wallet_days(self, wallet, start_day=None, end_day=None):
+        """
+        Yield (day_ordinal, record) for one wallet in day order, where record is
+        {"balance_total": ..., "transfers": [...], "inbound_transfers": [...]}.
+        Balances, outbound and inbound rows are streamed from three index-ordered
+        queries and merged, so only one day is held in memory at a time.
+        """
+        range_sql, range_params = self._day_range(start_day, end_day)
+
+        balances = (
+            (day, 0, {
+                "day": day,
+                "block_number": block_number,
+                "timestamp": timestamp,
+                "balance_free": balance_free,
+                "balance_staked": balance_staked,
+                "balance_total": balance_total,
+            })
+            for day, block_number, timestamp, balance_free, balance_staked, balance_total in self.conn.execute(
+                "SELECT day, block_number, timestamp, balance_free, balance_staked, balance_total "
+                "FROM balances WHERE wallet = ?" + range_sql + " ORDER BY day",
+                [wallet, *range_params],
+            )
+        )
+
+        def transfers(kind, column):
+            for (transfer_id, block_number, timestamp, day, from_ss58, to_ss58,
+                 amount, fee, extrinsic_id, transaction_hash) in self.conn.execute(
+                "SELECT transfer_id, block_number, timestamp, day, from_ss58, to_ss58, "
+                "amount, fee, extrinsic_id, transaction_hash "
+                f"FROM transfers WHERE {column} = ?" + range_sql + " ORDER BY day, block_number",
+                [wallet, *range_params],
+            ):
+                yield day, kind, {
+                    "id": transfer_id,
+                    "block_number": block_number,
+                    "timestamp": timestamp,
+                    "from": {"ss58": from_ss58},
+                    "to": {"ss58": to_ss58},
+                    "amount": amount,
+                    "fee": fee,
+                    "extrinsic_id": extrinsic_id,
+                    "transaction_hash": transaction_hash,
+                }
+
+        merged = heapq.merge(balances, transfers(1, "from_ss58"), transfers(2, "to_ss58"), key=itemgetter(0, 1))
+        for day, items in groupby(merged, key=itemgetter(0)):
+            record = {}
+            for _, kind, row in items:
+                if kind == 0:
+                    record.update(row)
+                else:
+                    record.setdefault("transfers" if kind == 1 else "inbound_transfers", []).append(row)
+            yield key_to_day(day), record
+
+    def iter_wallet_event_rows(self, wallet):
+        """
+        Yield (day, kind, timestamp, amount, from_ss58, to_ss58) tuples for one wallet in
+        day order: kind 0 is the day's balance snapshot (amount = balance_total, no
+        addresses), 1 an outbound and 2 an inbound transfer. Like iter_wallet_days, but
+        as plain tuples straight from the cursors, for the event pipeline (events.py).
+        """
+        balances = self.conn.execute(
+            "SELECT day, 0, timestamp, balance_total, NULL, NULL FROM balances WHERE wallet = ? ORDER BY day",
+            (wallet,),
+        )
+        outbound, inbound = (
+            self.conn.execute(
+                f"SELECT day, {kind}, timestamp, amount, from_ss58, to_ss58 FROM transfers "
+                f"WHERE {column} = ? ORDER BY day, block_number",
+                (wallet,),
+            )
+            for kind, column in ((1, "from_ss58"), (2, "to_ss58"))
+        )
+        return heapq.merge(balances, outbound, inbound, key=itemgetter(0, 1))
+
+    def load_final_data(self, wallet, start_day=None, end_day=None):
+        """
+        Rebuild the per-day structure the aggregation works on for one wallet:
+        {day_ordinal: {"balance_total": ..., "transfers": [...], "inbound_transfers": [...]}},
+        limited to [start_day, end_day] (day keys) when given.
+        """
+        return dict(self.iter_wallet_days(wallet, start_day, end_day))
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+# The three streams we sync for every wallet
+STREAMS = ("balances", "outbound", "inbound")
+
+
+def row_position(row):
+    """
+    Position of a row in its stream: (block_number, timestamp).
+    Block numbers are preferred; the timestamp is only used when a row has none.
+    """
+    block = row.get("block_number")
+    block = int(block) if block is not None else -1
+    ts = row.get("timestamp")
+    ts = datetime.fromisoformat(ts).timestamp() if ts else 0.0
+    return block, ts
+
+
+def advance_cursor(cursor, rows):
+    """Return the cursor moved forward to the newest row in 'rows'."""
+    best = cursor
+    best_pos = row_position(cursor) if cursor else None
+    for row in rows:
+        pos = row_position(row)
+        if best_pos is None or pos > best_pos:
+            best, best_pos = row, pos
+    if best is None:
+        return None
+    return {"block_number": best.get("block_number"), "timestamp": best.get("timestamp")}
+
+
+def cursors_from_final_data(final_data):
+    """
+    Derive cursors from an existing historical_data_{wallet}.json structure,
+    so legacy caches can be synced incrementally after import.
+    """
+    balances, outbound, inbound = [], [], []
+    for row in final_data.values():
+        if "balance_total" in row:
+            balances.append(row)
+        outbound.extend(row.get("transfers", []))
+        inbound.extend(row.get("inbound_transfers", []))
+    return {
+        "balances": advance_cursor(None, balances),
+        "outbound": advance_cursor(None, outbound),
+        "inbound": advance_cursor(None, inbound),
+    }
+
+
+def older_than(cursor):
+    """
+    Predicate for RateLimitedFetcher.fetch_many: True for rows strictly older than 'cursor'.
+    Rows at the cursor itself are fetched again and de-duplicated on merge, so a block
+    that was only partly indexed on the previous run is still picked up.
+    """
+    cursor_pos = row_position(cursor)
+
+    def is_old(row):
+        block, ts = row_position(row)
+        if block >= 0 and cursor_pos[0] >= 0:
+            return block < cursor_pos[0]
+        return ts < cursor_pos[1]
+
+    return is_old
@@ -0,0 +1,187 @@
+"""
+Table files for data_total_final2 and the daily reports.
+
+The format follows the file extension: plain CSV (the default), gzip or zstd
+compressed CSV, or typed columnar Parquet / Arrow IPC. The columnar formats store
+numbers as int64/float64 columns, so readers (read_lifo, BI tools) get typed values
+without parsing text; Arrow files are read through a memory map. The optional
+libraries are only imported once a format needs them, so plain CSV runs start fast.
+"""
+import csv
+import gzip
+import logging
+
+# Optional dependencies, imported on first use (see _require)
+pa = pq = zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Extension of each format; "csv" stays the default everywhere
+FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "csv.zst": ".csv.zst",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+# Rows buffered per Parquet row group / Arrow record batch
+BATCH_ROWS = 65536
+
+
+def table_format(path):
+    """Format of 'path' by its extension, or None if it is not a table file."""
+    for fmt, ext in sorted(FORMATS.items(), key=lambda item: -len(item[1])):
+        if path.endswith(ext):
+            return fmt
+    return None
+
+
+def split_format(path):
+    """Return (path without extension, format), or (path, None)."""
+    fmt = table_format(path)
+    return (path[:-len(FORMATS[fmt])], fmt) if fmt else (path, None)
+
+
+def with_format(path, fmt):
+    """Swap the extension of 'path' for the one of 'fmt' ("daily_report.csv" -> "daily_report.parquet")."""
+    return split_format(path)[0] + FORMATS[fmt]
+
+
+def _require(fmt):
+    """Import the optional library 'fmt' needs, or raise if it is not installed."""
+    global pa, pq, zstandard
+    if fmt in ("parquet", "arrow") and pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError(f"The {fmt} format needs pyarrow (pip install pyarrow)")
+        pa, pq = pyarrow, pyarrow.parquet
+    if fmt == "csv.zst" and zstandard is None:
+        try:
+            import zstandard as zstd
+        except ImportError:
+            raise RuntimeError("The csv.zst format needs zstandard (pip install zstandard)")
+        zstandard = zstd
+
+
+def _open_text(path, mode, fmt):
+    if fmt == "csv.gz":
+        return gzip.open(path, mode + "t", newline="")
+    if fmt == "csv.zst":
+        return zstandard.open(path, mode + "t", newline="")
+    return open(path, mode, newline="")
+
+
+def _cast_str(value):
+    return value if value is None else str(value)
+
+
+_CASTS = {"int": int, "float": float, "str": _cast_str}
+_ARROW_TYPES = {"int": "int64", "float": "float64", "str": "string"}
+
+
+class TableWriter:
+    """
+    Row-by-row writer for any supported format, used like csv.writer / csv.DictWriter:
+    rows are sequences in 'fieldnames' order or dicts keyed by field name.
+
+    'types' maps field names to "int", "float" or "str" (the default); it only
+    matters for the columnar formats.
+    """
+
+    def __init__(self, path, fieldnames, types=None):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.format = table_format(path) or "csv"
+        _require(self.format)
+
+        if self.format.startswith("csv"):
+            self._file = _open_text(path, "w", self.format)
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.fieldnames)
+            return
+
+        types = types or {}
+        self._casts = [_CASTS[types.get(name, "str")] for name in self.fieldnames]
+        self._schema = pa.schema([(name, _ARROW_TYPES[types.get(name, "str")]) for name in self.fieldnames])
+        self._columns = [[] for _ in self.fieldnames]
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def writerow(self, row):
+        if isinstance(row, dict):
+            row = [row[name] for name in self.fieldnames]
+        if self.format.startswith("csv"):
+            self._csv.writerow(row)
+            return
+        for column, cast, value in zip(self._columns, self._casts, row):
+            column.append(cast(value))
+        if len(self._columns[0]) >= BATCH_ROWS:
+            self._flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _flush(self):
+        batch = pa.record_batch(self._columns, schema=self._schema)
+        if self.format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self._columns = [[] for _ in self.fieldnames]
+
+    def close(self):
+        if self.format.startswith("csv"):
+            self._file.close()
+            return
+        if self._columns[0]:
+            self._flush()
+        self._writer.close()
+        if self.format == "arrow":
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_table(path):
+    """
+    Open a table file. Returns (fieldnames, iterator of row dicts); CSV values are
+    strings, Parquet/Arrow values keep their column types.
+    """
+    fmt = table_format(path) or "csv"
+    _require(fmt)
+
+    if fmt.startswith("csv"):
+        f = _open_text(path, "r", fmt)
+        reader = csv.DictReader(f)
+        return reader.fieldnames, _closing(reader, f)
+
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(path)
+        batches = parquet_file.iter_batches(batch_size=BATCH_ROWS)
+        return parquet_file.schema_arrow.names, _closing(
+            (row for batch in batches for row in batch.to_pylist()), parquet_file
+        )
+
+    source = pa.memory_map(path, "r")
+    reader = pa.ipc.open_file(source)
+    return reader.schema.names, _closing(
+        (row for i in range(reader.num_record_batches) for row in reader.get_batch(i).to_pylist()), source
+    )
+
+
+def _closing(rows, resource):
+    try:
+        yield from rows
+    finally:
+        resource.close()
@@ -0,0 +1,50 @@
+from events import ACQUISITION, DISPOSAL, wallet_events
+from read_lifo import Inventory, replay_events
+from transfer_index import TransferIndex
+
+RAO = 10 ** 9
+DAY_1 = "2024-01-01T00:00:00.00"
+DAY_2 = "2024-01-02T00:00:00.00"
+# Unix timestamps of 2024-01-01 23:00 and 2024-01-02 00:00 / 06:00 UTC
+SNAPSHOT_1 = 1704150000
+MIDNIGHT_2 = 1704153600
+SALE_TIME = MIDNIGHT_2 + 6 * 3600
+
+
+def _rows():
+    """Wallet W: 300 TAO on day 1; day 2 earns 10 TAO, receives 5 from outside, sells 12 at 06:00."""
+    return [
+        (DAY_1, 0, "2024-01-01T23:00:00Z", 300 * RAO, None, None),
+        (DAY_2, 0, "2024-01-02T23:00:00Z", 310 * RAO, None, None),
+        (DAY_2, 1, "2024-01-02T06:00:00Z", 12 * RAO, "W", "SELL"),
+        (DAY_2, 2, "2024-01-02T03:00:00Z", 5 * RAO, "EXT", "W"),
+        (DAY_2, 2, "2024-01-02T04:00:00Z", 7 * RAO, "OWN", "W"),
+    ]
+
+
+def _events():
+    index = TransferIndex(["W", "OWN"], ["SELL"])
+    return list(wallet_events(_rows(), 0, index, exact=True))
+
+
+def test_day_acquisitions_come_before_the_days_sales():
+    events = _events()
+    assert events == [
+        # Day 1 is the first snapshot: its 300 TAO are over the received limit
+        (MIDNIGHT_2, 0, ACQUISITION, 10 * RAO),
+        (MIDNIGHT_2 + 3 * 3600, 0, ACQUISITION, 5 * RAO),
+        (SALE_TIME, 0, DISPOSAL, 12 * RAO),
+    ]
+    assert all(timestamp > SNAPSHOT_1 for timestamp, *_ in events)
+
+
+def test_same_day_buy_then_sell_uses_the_days_lots():
+    prices = {MIDNIGHT_2: 2_000_000, MIDNIGHT_2 + 3 * 3600: 3_000_000, SALE_TIME: 4_000_000}
+    inventory = Inventory(exact=True)
+    (day,) = replay_events(_events(), prices.__getitem__, inventory, 0)
+
+    assert day["timestamp"] == "2024-01-02"
+    assert day["sold_quantity"] == 12 * RAO
+    # LIFO: the 5 TAO bought at $3, then 7 of the 10 earned at $2
+    assert day["daily_cogs"] == 5 * RAO * 3_000_000 + 7 * RAO * 2_000_000
+    assert day["ending_inventory"] == 3 * RAO
@@ -0,0 +1,88 @@
+"""
+Global index of transfers: classifies each transfer by its two ends and counts it
+once, no matter how many of our wallets it shows up for (a transfer between two of
+our wallets is both one wallet's outbound and the other's inbound). Only the per-class
+counters are kept, so memory stays flat however long the history is.
+
+Classes, by hash-set lookups on the two ends:
+    SELL      sent to one of the sell wallets
+    INTERNAL  between two of our own (main or secondary) wallets
+    EXTERNAL  anything else
+"""
+import logging
+
+from store import transfer_key
+
+logger = logging.getLogger(__name__)
+
+SELL = "sell"
+INTERNAL = "internal"
+EXTERNAL = "external"
+CLASSES = (SELL, INTERNAL, EXTERNAL)
+
+
+def _ss58(side):
+    return (side or {}).get("ss58")
+
+
+class TransferIndex:
+    """
+    Transfer classes and per-class counts. 'wallets', 'sell_wallets' and
+    'secondary_wallets' are any iterables of ss58 addresses.
+    """
+
+    def __init__(self, wallets, sell_wallets, secondary_wallets=()):
+        self.own = frozenset(wallets) | frozenset(secondary_wallets)
+        self.sell = frozenset(sell_wallets)
+        self._counts = dict.fromkeys(CLASSES, 0)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def classify_addresses(self, source, destination):
+        if destination in self.sell:
+            return SELL
+        if source in self.own and destination in self.own:
+            return INTERNAL
+        return EXTERNAL
+
+    def classify(self, row, inbound=False):
+        """
+        Class of a transfer row, counted once: an inbound row sent by one of our own
+        wallets is that wallet's outbound too, so it is only counted on the sender's side.
+        """
+        source = _ss58(row.get("from"))
+        cls = self.classify_addresses(source, _ss58(row.get("to")))
+        if not (inbound and source in self.own):
+            self._counts[cls] += 1
+        return cls
+
+    def day_sums(self, outbound, inbound):
+        """
+        Return (outbound, sold, inbound) amount totals for one wallet-day. A transfer
+        listed twice on the same side (e.g. on overlapping pages) is only counted once.
+        """
+        outbound_total = sold = inbound_total = 0
+        seen = set()
+        for row in outbound:
+            key = transfer_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            amount = int(row["amount"])
+            outbound_total += amount
+            if self.classify(row) == SELL:
+                sold += amount
+        seen = set()
+        for row in inbound:
+            key = transfer_key(row)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.classify(row, inbound=True)
+            inbound_total += int(row["amount"])
+        return outbound_total, sold, inbound_total
+
+    def counts(self):
+        """{class: number of transfers} classified so far."""
+        return dict(self._counts)
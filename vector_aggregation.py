@@ -0,0 +1,144 @@
+"""
+NumPy engine for the per-wallet daily totals in read_all_new.
+
+Loads every wallet's balances and transfers into typed arrays (int64 rao amounts,
+int64 day ordinals, sell flags from the shared TransferIndex) and computes outbound,
+sold, inbound and balance deltas for all wallets at once. The results match
+compute_day_totals in read_all_new number for number: the same float operations are
+applied in the same order, just element-wise.
+"""
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from amounts import RAO_PER_TAO
+from store import transfer_key
+from transfer_index import SELL
+
+logger = logging.getLogger(__name__)
+
+# Above this, int64 -> float64 is no longer exact and we divide in Python instead
+_EXACT_FLOAT_INT = 2 ** 53
+
+
+def available():
+    return np is not None
+
+
+def _to_tao(rao):
+    """Vectorized convert_to_tao: correctly rounded int / 1e9, like Python's int / int."""
+    if rao.size and int(np.abs(rao).max()) >= _EXACT_FLOAT_INT:
+        return np.array([int(v) / RAO_PER_TAO for v in rao.tolist()], dtype=np.float64)
+    return rao.astype(np.float64) / RAO_PER_TAO
+
+
+def _unique(transfers):
+    """'transfers' without repeats of the same transfer id (like TransferIndex.day_sums)."""
+    seen = set()
+    for t in transfers:
+        key = transfer_key(t)
+        if key not in seen:
+            seen.add(key)
+            yield key, t
+
+
+def compute_all_day_totals(all_final_data, index, exact=False):
+    """
+    Vectorized equivalent of calling compute_day_totals for every wallet with the
+    TransferIndex 'index'.
+    Returns {wallet: {day: {"day_total", "total_transferred", "received", "sold_transferred"}}},
+    in TAO or, when 'exact' is set, in integer rao.
+    """
+    convert = (lambda rao: rao) if exact else _to_tao
+    to_python = int if exact else float
+    wallets = list(all_final_data)
+
+    # ---------------------------
+    # Flatten into columns
+    # ---------------------------
+    key_wallet, key_day = [], []
+    bal_amount = []
+    out_key, out_amount, out_sell = [], [], []
+    in_key, in_amount = [], []
+
+    for w_idx, wallet in enumerate(wallets):
+        for day, r in all_final_data[wallet].items():
+            k = len(key_day)
+            key_wallet.append(w_idx)
+            key_day.append(day)
+            bal_amount.append(int(r["balance_total"]) if "balance_total" in r else 0)
+            for _, t in _unique(r.get("transfers", ())):
+                out_key.append(k)
+                out_amount.append(int(t["amount"]))
+                out_sell.append(index.classify(t) == SELL)
+            for _, t in _unique(r.get("inbound_transfers", ())):
+                index.classify(t, inbound=True)
+                in_key.append(k)
+                in_amount.append(int(t["amount"]))
+
+    n = len(key_day)
+    if n == 0:
+        return {wallet: {} for wallet in wallets}
+
+    wallet_arr = np.array(key_wallet, dtype=np.int64)
+    day_arr = np.array(key_day, dtype=np.int64)
+    balance = np.array(bal_amount, dtype=np.int64)
+
+    # ---------------------------
+    # Group transfers by (wallet, day)
+    # ---------------------------
+    outbound = np.zeros(n, dtype=np.int64)
+    sold = np.zeros(n, dtype=np.int64)
+    inbound = np.zeros(n, dtype=np.int64)
+
+    if out_key:
+        out_key_arr = np.array(out_key, dtype=np.int64)
+        out_amount_arr = np.array(out_amount, dtype=np.int64)
+        np.add.at(outbound, out_key_arr, out_amount_arr)
+
+        is_sell = np.array(out_sell, dtype=bool)
+        np.add.at(sold, out_key_arr[is_sell], out_amount_arr[is_sell])
+
+    if in_key:
+        np.add.at(inbound, np.array(in_key, dtype=np.int64), np.array(in_amount, dtype=np.int64))
+
+    # ---------------------------
+    # Balance deltas against the previous calendar day
+    # ---------------------------
+    order = np.lexsort((day_arr, wallet_arr))
+    w_sorted = wallet_arr[order]
+    d_sorted = day_arr[order]
+
+    day_total = convert(balance[order])
+    # Previous day's total only counts if that calendar day exists for the same wallet
+    has_prev = np.zeros(n, dtype=bool)
+    has_prev[1:] = (w_sorted[1:] == w_sorted[:-1]) & (d_sorted[1:] - d_sorted[:-1] == 1)
+    previous = np.zeros(n, dtype=day_total.dtype)
+    previous[1:] = day_total[:-1]
+    previous = np.where(has_prev, previous, 0)
+
+    outbound_tao = convert(outbound[order])
+    inbound_tao = convert(inbound[order])
+    sold_tao = convert(sold[order])
+
+    today_diff = day_total - previous
+    total_transferred = outbound_tao - inbound_tao
+    received = today_diff + outbound_tao - inbound_tao
+
+    # ---------------------------
+    # Back to the dict structure the rest of the pipeline expects
+    # ---------------------------
+    all_final_data_total = {wallet: {} for wallet in wallets}
+    for i, k in enumerate(order.tolist()):
+        all_final_data_total[wallets[key_wallet[k]]][key_day[k]] = {
+            "day_total": to_python(day_total[i]),
+            "total_transferred": to_python(total_transferred[i]),
+            "received": to_python(received[i]),
+            "sold_transferred": to_python(sold_tao[i]),
+        }
+
+    logger.debug(f"Vector engine aggregated {n} wallet-days for {len(wallets)} wallet(s).")
+    return all_final_data_total